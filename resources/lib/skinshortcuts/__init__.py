@@ -2,16 +2,20 @@
 
 from __future__ import annotations
 
-from .builders import IncludesBuilder
-from .config import SkinConfig
-from .models import (
-    Background,
-    Menu,
-    MenuItem,
-    PropertySchema,
-    SchemaProperty,
-    Widget,
-)
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .builders import IncludesBuilder
+    from .config import SkinConfig
+    from .models import (
+        Background,
+        Menu,
+        MenuItem,
+        PropertySchema,
+        SchemaProperty,
+        Widget,
+    )
 
 __version__ = "3.0.0-dev"
 __all__ = [
@@ -25,3 +29,25 @@ __all__ = [
     "PropertySchema",
     "SchemaProperty",
 ]
+
+# Public names are imported on first access (PEP 562) so entry points that
+# never build or load config don't pay for the whole package at startup.
+_LAZY_IMPORTS = {
+    "SkinConfig": ".config",
+    "IncludesBuilder": ".builders",
+    "Menu": ".models",
+    "MenuItem": ".models",
+    "Widget": ".models",
+    "Background": ".models",
+    "PropertySchema": ".models",
+    "SchemaProperty": ".models",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -2,8 +2,29 @@
 
 from __future__ import annotations
 
-from .includes import IncludesBuilder
-from .template import TemplateBuilder
-from .views import ViewExpressionBuilder
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .includes import IncludesBuilder
+    from .template import TemplateBuilder
+    from .views import ViewExpressionBuilder
 
 __all__ = ["IncludesBuilder", "TemplateBuilder", "ViewExpressionBuilder"]
+
+# Imported on first access (PEP 562); IncludesBuilder loads the template and
+# view builders itself only when a skin defines templates or views.
+_LAZY_IMPORTS = {
+    "IncludesBuilder": ".includes",
+    "TemplateBuilder": ".template",
+    "ViewExpressionBuilder": ".views",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,49 @@
+"""Shared element helpers for builders."""
+
+from __future__ import annotations
+
+import copy
+import xml.etree.ElementTree as ET
+
+
+def clone_element(src: ET.Element) -> ET.Element:
+    """Copy an element subtree.
+
+    The C accelerator implements Element.__deepcopy__ natively, which is
+    several times faster than rebuilding the subtree from Python.
+    """
+    return copy.deepcopy(src)
+
+
+_INDENTS = ["\n"]
+
+
+def _indent(level: int) -> str:
+    """Newline plus `level` tabs, built once per depth."""
+    while len(_INDENTS) <= level:
+        _INDENTS.append(_INDENTS[-1] + "\t")
+    return _INDENTS[level]
+
+
+def indent_xml(elem: ET.Element, level: int = 0) -> None:
+    """Add indentation to XML tree.
+
+    Walks the tree with an explicit stack; only whitespace-only text and
+    tails are replaced.
+    """
+    if (len(elem) or level) and (not elem.tail or not elem.tail.strip()):
+        elem.tail = _indent(level)
+    stack = [(elem, level)]
+    while stack:
+        node, node_level = stack.pop()
+        if not len(node):
+            continue
+        child_indent = _indent(node_level + 1)
+        if not node.text or not node.text.strip():
+            node.text = child_indent
+        for child in node:
+            if not child.tail or not child.tail.strip():
+                child.tail = child_indent
+            stack.append((child, node_level + 1))
+        if not child.tail.strip():
+            child.tail = _indent(node_level)
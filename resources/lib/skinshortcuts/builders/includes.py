@@ -2,21 +2,60 @@
 
 from __future__ import annotations
 
+import os
 import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, TextIO
 
 from ..constants import extract_path_from_action
+from .base import clone_element, indent_xml
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
     from ..models import Menu, MenuItem
-    from ..models.menu import SubDialog
+    from ..models.menu import Action, DefaultAction, IncludeRef, SubDialog
     from ..models.property import PropertySchema
     from ..models.template import TemplateSchema
     from ..models.views import ViewConfig
     from ..userdata import UserData
 
 
+# (item property, include name suffix) per custom widget slot
+CUSTOM_WIDGET_SLOTS = tuple(
+    (f"customWidget{suffix}", suffix.lstrip("."))
+    for suffix in ("", ".2", ".3", ".4", ".5", ".6", ".7", ".8", ".9", ".10")
+)
+_CUSTOM_WIDGET_PROPERTIES = frozenset(prop_name for prop_name, _ in CUSTOM_WIDGET_SLOTS)
+
+# includes.xml is usually a few hundred KB to a few MB; flush in large chunks
+_WRITE_BUFFER_SIZE = 1 << 20
+
+
+@dataclass
+class _DefaultPartitions:
+    """A menu's default includes and actions, grouped by where they are emitted."""
+
+    before_includes: list[IncludeRef]
+    after_includes: list[IncludeRef]
+    before_actions: list[DefaultAction]
+    after_actions: list[DefaultAction]
+
+
+@dataclass
+class _ItemPartitions:
+    """An item's own includes grouped by position, and its actions in emit order.
+
+    Conditional actions are emitted before unconditional ones.
+    """
+
+    before_includes: list[IncludeRef]
+    after_includes: list[IncludeRef]
+    actions: list[Action]
+
+
 class IncludesBuilder:
     """Builds script-skinshortcuts-includes.xml from models."""
 
@@ -38,11 +77,24 @@ class IncludesBuilder:
         self.subdialogs = subdialogs or []
         self.submenu_path_all = submenu_path_all
         self._menu_map: dict[str, Menu] = {m.name: m for m in menus}
+        self._defaults_cache: dict[int, _DefaultPartitions] = {}
+        self._enabled_cache: dict[int, list[tuple[int, MenuItem]]] = {}
+        self._item_cache: dict[int, _ItemPartitions] = {}
+        self._custom_widget_cache: dict[int, list[ET.Element]] = {}
+        self._template_only_names: frozenset[str] = frozenset(
+            name
+            for name, prop in (property_schema.properties.items() if property_schema else ())
+            if prop.template_only
+        )
 
     def build(self) -> ET.Element:
         """Build the includes XML tree."""
         root = ET.Element("includes")
+        root.extend(self._iter_includes())
+        return root
 
+    def _iter_includes(self) -> Iterator[ET.Element]:
+        """Yield each top-level include/variable/expression element in output order."""
         # Build includes only for root menus (not submenus)
         # A menu is a root menu if:
         # 1. It was defined with <menu> tag (is_submenu=False), AND
@@ -81,17 +133,14 @@ class IncludesBuilder:
             )
 
         for menu in build_menus:
-            include = self._build_menu_include(menu)
-            root.append(include)
+            yield self._build_menu_include(menu)
 
             if "submenu" not in menu.template_only:
                 submenu_include = self._build_submenu_include(menu)
                 if submenu_include is not None:
-                    root.append(submenu_include)
+                    yield submenu_include
 
-            custom_widget_includes = self._build_custom_widget_includes(menu)
-            for cw_include in custom_widget_includes:
-                root.append(cw_include)
+            yield from self._build_custom_widget_includes(menu)
 
         emitted_submenu_names: set[str] = set()
         for menu in self.menus:
@@ -110,8 +159,7 @@ class IncludesBuilder:
                 continue
             if include_name in emitted_submenu_names:
                 continue
-            include = self._build_menu_include(menu, name_override=include_name)
-            root.append(include)
+            yield self._build_menu_include(menu, name_override=include_name)
             emitted_submenu_names.add(include_name)
 
         if self.templates and self.templates.templates:
@@ -122,60 +170,56 @@ class IncludesBuilder:
                 menus=self.menus,
                 property_schema=self.property_schema,
             )
-            template_root = template_builder.build()
-            for template_include in template_root:
-                root.append(template_include)
+            yield from template_builder.build()
 
         if self.view_config and self.view_config.content_rules and self.userdata:
             from .views import ViewExpressionBuilder
 
             view_builder = ViewExpressionBuilder(self.view_config, self.userdata)
-            for expr in view_builder.build():
-                root.append(expr)
-
-        return root
+            yield from view_builder.build()
 
     def _build_menu_include(self, menu: Menu, name_override: str | None = None) -> ET.Element:
-        include = ET.Element("include")
-        include.set("name", f"skinshortcuts-{name_override or menu.name}")
+        include = ET.Element("include", {"name": f"skinshortcuts-{name_override or menu.name}"})
 
         start = menu.startid if menu.controltype else 1
-        for idx, item in enumerate(menu.items, start=start):
-            if item.disabled:
-                continue
-            item_elem = self._build_item(item, idx, menu)
-            include.append(item_elem)
+        build_item = self._item_builder(menu)
+        include.extend(
+            [build_item(item, start + pos, menu) for pos, item in self._enabled_items(menu)]
+        )
 
         return include
 
     def _build_submenu_include(self, parent_menu: Menu) -> ET.Element | None:
         """Build combined submenu include for a root menu."""
-        submenu_items: list[tuple[MenuItem, MenuItem, int, Menu]] = []
+        submenu_items: list[tuple[MenuItem, MenuItem, Menu, str | None]] = []
+        container = parent_menu.container
 
-        for parent_item in parent_menu.items:
-            if parent_item.disabled:
-                continue
+        for _, parent_item in self._enabled_items(parent_menu):
             submenu_key = f"{parent_menu.name}/{parent_item.name}"
             submenu = self._menu_map.get(submenu_key)
             if not submenu:
                 continue
-            for idx, sub_item in enumerate(submenu.items, start=1):
-                if not sub_item.disabled:
-                    submenu_items.append((parent_item, sub_item, idx, submenu))
+            visibility = (
+                f"String.IsEqual(Container({container}).ListItem.Property(name),"
+                f"{parent_item.name})"
+                if container
+                else None
+            )
+            for _, sub_item in self._enabled_items(submenu):
+                submenu_items.append((parent_item, sub_item, submenu, visibility))
 
         if not submenu_items:
             return None
 
-        include = ET.Element("include")
-        include.set("name", f"skinshortcuts-{parent_menu.name}-submenu")
-
-        global_idx = 1
-        for parent_item, sub_item, _, submenu in submenu_items:
-            elem = self._build_submenu_item(
-                sub_item, global_idx, parent_item, submenu, parent_menu.container
-            )
-            include.append(elem)
-            global_idx += 1
+        include = ET.Element("include", {"name": f"skinshortcuts-{parent_menu.name}-submenu"})
+        include.extend(
+            [
+                self._build_submenu_item(sub_item, global_idx, parent_item, submenu, visibility)
+                for global_idx, (parent_item, sub_item, submenu, visibility) in enumerate(
+                    submenu_items, start=1
+                )
+            ]
+        )
 
         return include
 
@@ -185,17 +229,17 @@ class IncludesBuilder:
         idx: int,
         parent_item: MenuItem,
         menu: Menu,
-        container: str | None,
+        visibility: str | None,
     ) -> ET.Element:
-        """Build a submenu item element with parent linking and visibility."""
+        """Build a submenu item element with parent linking and visibility.
+
+        `visibility` is the parent-match condition, shared by all items of
+        one parent (None when the parent menu has no container).
+        """
         elem = self._build_item(item, idx, menu)
         self._add_property(elem, "parent", parent_item.name)
 
-        if container:
-            visibility = (
-                f"String.IsEqual(Container({container}).ListItem.Property(name),"
-                f"{parent_item.name})"
-            )
+        if visibility:
             existing = elem.find("visible")
             if existing is not None and existing.text:
                 existing.text = f"[{existing.text}] + [{visibility}]"
@@ -219,12 +263,11 @@ class IncludesBuilder:
         """
         includes = []
 
-        for parent_item in parent_menu.items:
-            if parent_item.disabled:
+        for _, parent_item in self._enabled_items(parent_menu):
+            if parent_item.properties.keys().isdisjoint(_CUSTOM_WIDGET_PROPERTIES):
                 continue
 
-            for suffix in ["", ".2", ".3", ".4", ".5", ".6", ".7", ".8", ".9", ".10"]:
-                prop_name = f"customWidget{suffix}"
+            for prop_name, suffix_name in CUSTOM_WIDGET_SLOTS:
                 cw_menu_ref = parent_item.properties.get(prop_name)
                 if not cw_menu_ref:
                     continue
@@ -233,114 +276,166 @@ class IncludesBuilder:
                 if not cw_menu or not cw_menu.items:
                     continue
 
-                suffix_name = suffix.replace(".", "") if suffix else ""
-                include = ET.Element("include")
-                include.set("name", f"skinshortcuts-{parent_item.name}-customwidget{suffix_name}")
-
-                for idx, cw_item in enumerate(cw_menu.items, start=1):
-                    if cw_item.disabled:
-                        continue
-                    elem = self._build_item(cw_item, idx, cw_menu)
-                    include.append(elem)
-
+                include = ET.Element(
+                    "include", {"name": f"skinshortcuts-{parent_item.name}-customwidget{suffix_name}"}
+                )
+                include.extend(self._custom_widget_items(cw_menu))
                 includes.append(include)
 
         return includes
 
+    def _custom_widget_items(self, cw_menu: Menu) -> list[ET.Element]:
+        """Item elements for a custom widget menu.
+
+        The items don't depend on the referencing parent item, so they are
+        built once per menu; later references get copies of the first build.
+        """
+        built = self._custom_widget_cache.get(id(cw_menu))
+        if built is not None:
+            return [clone_element(elem) for elem in built]
+        build_item = self._item_builder(cw_menu)
+        built = [
+            build_item(cw_item, pos + 1, cw_menu) for pos, cw_item in self._enabled_items(cw_menu)
+        ]
+        self._custom_widget_cache[id(cw_menu)] = built
+        return built
+
     def _build_item(self, item: MenuItem, idx: int, menu: Menu) -> ET.Element:
-        if menu.controltype:
-            elem = ET.Element("control")
-            elem.set("type", menu.controltype)
-        else:
-            elem = ET.Element("item")
-        elem.set("id", str(idx))
+        return self._item_builder(menu)(item, idx, menu)
+
+    def _item_builder(self, menu: Menu) -> Callable[[MenuItem, int, Menu], ET.Element]:
+        """Item builder for a menu, chosen once per include rather than per item."""
+        return self._build_control_item if menu.controltype else self._build_menu_item
+
+    def _build_control_item(self, item: MenuItem, idx: int, menu: Menu) -> ET.Element:
+        """Build a <control type="..."> element; controls carry no properties."""
+        elem = ET.Element("control", {"type": menu.controltype, "id": str(idx)})
 
         ET.SubElement(elem, "label").text = item.label
         if item.label2:
             ET.SubElement(elem, "label2").text = item.label2
-        if not menu.controltype:
-            ET.SubElement(elem, "icon").text = item.icon
         if item.thumb:
             ET.SubElement(elem, "thumb").text = item.thumb
 
-        all_includes = menu.defaults.includes + item.includes
-        before_includes = [i for i in all_includes if i.position == "before-onclick"]
-        after_includes = [i for i in all_includes if i.position == "after-onclick"]
-
-        for inc in before_includes:
-            include_elem = ET.SubElement(elem, "include")
-            include_elem.text = inc.name
-            if inc.condition:
-                include_elem.set("condition", inc.condition)
-
-        before_actions = [a for a in menu.defaults.actions if a.when == "before"]
-        after_actions = [a for a in menu.defaults.actions if a.when == "after"]
-        conditional = [a for a in item.actions if a.condition]
-        unconditional = [a for a in item.actions if not a.condition]
-
-        for act in before_actions:
-            onclick = ET.SubElement(elem, "onclick")
-            onclick.text = act.action
-            if act.condition:
-                onclick.set("condition", act.condition)
-
-        for act in conditional + unconditional:
-            onclick = ET.SubElement(elem, "onclick")
-            onclick.text = act.action
-            if act.condition:
-                onclick.set("condition", act.condition)
-
-        for act in after_actions:
-            onclick = ET.SubElement(elem, "onclick")
-            onclick.text = act.action
-            if act.condition:
-                onclick.set("condition", act.condition)
-
-        for inc in after_includes:
-            include_elem = ET.SubElement(elem, "include")
-            include_elem.text = inc.name
-            if inc.condition:
-                include_elem.set("condition", inc.condition)
+        self._add_item_actions(elem, item, menu)
+        return elem
 
-        if item.visible:
-            ET.SubElement(elem, "visible").text = item.visible
+    def _build_menu_item(self, item: MenuItem, idx: int, menu: Menu) -> ET.Element:
+        """Build an <item> element with its builtin and custom properties."""
+        elem = ET.Element("item", {"id": str(idx)})
 
-        if not menu.controltype:
-            builtins = {
-                "id": str(idx),
-                "name": item.name,
-                "menu": menu.template_origin or menu.name,
-                "action": item.action,
-                "path": extract_path_from_action(item.action) if item.action else "",
-                "submenuVisibility": item.name,
-            }
-
-            submenu_key = f"{menu.name}/{item.name}"
-            submenu = self._menu_map.get(submenu_key)
-            if submenu and submenu.items:
-                builtins["hasSubmenu"] = "True"
+        ET.SubElement(elem, "label").text = item.label
+        if item.label2:
+            ET.SubElement(elem, "label2").text = item.label2
+        ET.SubElement(elem, "icon").text = item.icon
+        if item.thumb:
+            ET.SubElement(elem, "thumb").text = item.thumb
 
-            all_properties = {**menu.defaults.properties, **item.properties}
-            all_properties.update(self._submenu_paths_for_item(item, menu))
+        self._add_item_actions(elem, item, menu)
 
-            # a skin value of the same name replaces the default, in the default's slot
-            for key, value in builtins.items():
-                self._add_property(elem, key, all_properties.pop(key, value))
+        builtins = {
+            "id": str(idx),
+            "name": item.name,
+            "menu": menu.template_origin or menu.name,
+            "action": item.action,
+            "path": extract_path_from_action(item.action) if item.action else "",
+            "submenuVisibility": item.name,
+        }
 
-            for key, value in all_properties.items():
-                if self._is_template_only(key):
-                    continue
-                self._add_property(elem, key, value)
+        submenu_key = f"{menu.name}/{item.name}"
+        submenu = self._menu_map.get(submenu_key)
+        if submenu and submenu.items:
+            builtins["hasSubmenu"] = "True"
+
+        all_properties = {**menu.defaults.properties, **item.properties}
+        all_properties.update(self._submenu_paths_for_item(item, menu))
+
+        make_property = elem.makeelement
+        is_template_only = self._is_template_only
+        properties: list[ET.Element] = []
+
+        # a skin value of the same name replaces the default, in the default's slot
+        for key, value in builtins.items():
+            value = all_properties.pop(key, value)
+            if value:
+                prop = make_property("property", {"name": key})
+                prop.text = value
+                properties.append(prop)
+
+        for key, value in all_properties.items():
+            if not value or is_template_only(key):
+                continue
+            prop = make_property("property", {"name": key})
+            prop.text = value
+            properties.append(prop)
+
+        elem.extend(properties)
 
         return elem
 
-    @staticmethod
-    def _enabled_widgets(submenu: Menu) -> list[MenuItem]:
+    def _add_item_actions(self, elem: ET.Element, item: MenuItem, menu: Menu) -> None:
+        """Add include refs, onclick actions and visibility shared by both item kinds."""
+        defaults = self._default_partitions(menu)
+        own = self._item_partitions(item)
+
+        for inc in chain(defaults.before_includes, own.before_includes):
+            _add_conditional(elem, "include", inc.name, inc.condition)
+
+        for act in chain(defaults.before_actions, own.actions, defaults.after_actions):
+            _add_conditional(elem, "onclick", act.action, act.condition)
+
+        for inc in chain(defaults.after_includes, own.after_includes):
+            _add_conditional(elem, "include", inc.name, inc.condition)
+
+        if item.visible:
+            ET.SubElement(elem, "visible").text = item.visible
+
+    def _enabled_items(self, menu: Menu) -> list[tuple[int, MenuItem]]:
+        """Enabled items of a menu with their 0-based position among all items.
+
+        Positions include disabled items so control/item ids stay stable.
+        Built once per menu; submenus and custom widget menus can be
+        referenced from several root menus.
+        """
+        enabled = self._enabled_cache.get(id(menu))
+        if enabled is None:
+            enabled = [(pos, item) for pos, item in enumerate(menu.items) if not item.disabled]
+            self._enabled_cache[id(menu)] = enabled
+        return enabled
+
+    def _default_partitions(self, menu: Menu) -> _DefaultPartitions:
+        """Menu defaults split by include position and action timing, built once per menu."""
+        partitions = self._defaults_cache.get(id(menu))
+        if partitions is None:
+            defaults = menu.defaults
+            partitions = _DefaultPartitions(
+                before_includes=[i for i in defaults.includes if i.position == "before-onclick"],
+                after_includes=[i for i in defaults.includes if i.position == "after-onclick"],
+                before_actions=[a for a in defaults.actions if a.when == "before"],
+                after_actions=[a for a in defaults.actions if a.when == "after"],
+            )
+            self._defaults_cache[id(menu)] = partitions
+        return partitions
+
+    def _item_partitions(self, item: MenuItem) -> _ItemPartitions:
+        """An item's own includes by position and actions in emit order, built once per item."""
+        partitions = self._item_cache.get(id(item))
+        if partitions is None:
+            partitions = _ItemPartitions(
+                before_includes=[i for i in item.includes if i.position == "before-onclick"],
+                after_includes=[i for i in item.includes if i.position == "after-onclick"],
+                actions=[a for a in item.actions if a.condition]
+                + [a for a in item.actions if not a.condition],
+            )
+            self._item_cache[id(item)] = partitions
+        return partitions
+
+    def _enabled_widgets(self, submenu: Menu) -> list[MenuItem]:
         """Submenu items that are widgets: enabled and carrying a widgetPath."""
         return [
             sub_item
-            for sub_item in submenu.items
-            if not sub_item.disabled and sub_item.properties.get("widgetPath")
+            for _, sub_item in self._enabled_items(submenu)
+            if sub_item.properties.get("widgetPath")
         ]
 
     def _widget_submenu_for_item(self, item: MenuItem) -> Menu | None:
@@ -391,9 +486,7 @@ class IncludesBuilder:
         for menu in self.menus:
             if menu.name in exclude:
                 continue
-            for item in menu.items:
-                if item.disabled:
-                    continue
+            for _, item in self._enabled_items(menu):
                 for act in item.actions:
                     if act.action:
                         actions.add(act.action.lower())
@@ -404,42 +497,75 @@ class IncludesBuilder:
 
         Numeric slot variants (widgetSortby.2) inherit the base property's flag.
         """
-        if not self.property_schema:
+        if not self._template_only_names:
+            return False
+        if prop_name in self._template_only_names:
+            return True
+        if self.property_schema is None or prop_name in self.property_schema.properties:
             return False
-        prop = self.property_schema.get_property(prop_name)
-        if prop is None:
-            base, sep, tail = prop_name.rpartition(".")
-            if sep and tail.isdigit():
-                prop = self.property_schema.get_property(base)
-        return prop is not None and prop.template_only
+        base, sep, tail = prop_name.rpartition(".")
+        return bool(sep) and tail.isdigit() and base in self._template_only_names
 
     @staticmethod
     def _add_property(parent: ET.Element, name: str, value: str) -> None:
         if value:
-            prop = ET.SubElement(parent, "property")
-            prop.set("name", name)
-            prop.text = value
+            ET.SubElement(parent, "property", {"name": name}).text = value
 
     def write(self, path: str | Path, indent: bool = True) -> None:
-        """Write includes XML to file."""
-        root = self.build()
-        if indent:
-            _indent_xml(root)
-        tree = ET.ElementTree(root)
-        tree.write(str(path), encoding="UTF-8", xml_declaration=True)
-
-
-def _indent_xml(elem: ET.Element, level: int = 0) -> None:
-    """Add indentation to XML tree."""
-    indent = "\n" + "\t" * level
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = indent + "\t"
+        """Write includes XML to file.
+
+        Each top-level include is serialized as soon as the next one is built,
+        so only one include's subtree is held beyond the template output.
+        Output matches ElementTree.write of the full tree.
+
+        Output goes to a temporary file that replaces the target once complete,
+        so a failed build never leaves a truncated includes file behind.
+        """
+        path = str(path)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(
+                tmp_path,
+                "w",
+                buffering=_WRITE_BUFFER_SIZE,
+                encoding="UTF-8",
+                errors="xmlcharrefreplace",
+            ) as f:
+                self._write_includes(f, indent)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _write_includes(self, f: TextIO, indent: bool) -> None:
+        """Serialize the declaration and <includes> root to an open file."""
+        f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        pending: ET.Element | None = None
+        for include in self._iter_includes():
+            if pending is None:
+                f.write("<includes>\n\t" if indent else "<includes>")
+            else:
+                _write_include(f, pending, "\n\t" if indent else None)
+            pending = include
+        if pending is None:
+            f.write("<includes />")
+            return
+        _write_include(f, pending, "\n" if indent else None)
+        f.write("</includes>\n" if indent else "</includes>")
+
+
+def _write_include(f: TextIO, elem: ET.Element, tail: str | None) -> None:
+    """Serialize one top-level child of <includes>, then release it."""
+    if tail is not None:
+        indent_xml(elem, 1)
         if not elem.tail or not elem.tail.strip():
-            elem.tail = indent
-        for child in elem:
-            _indent_xml(child, level + 1)
-        if not child.tail or not child.tail.strip():
-            child.tail = indent
-    elif level and (not elem.tail or not elem.tail.strip()):
-        elem.tail = indent
+            elem.tail = tail
+    ET.ElementTree(elem).write(f, encoding="unicode")
+    elem.clear()
+
+
+def _add_conditional(parent: ET.Element, tag: str, text: str, condition: str) -> None:
+    """Append <tag condition="...">text</tag>, omitting an empty condition."""
+    attrib = {"condition": condition} if condition else {}
+    ET.SubElement(parent, tag, attrib).text = text
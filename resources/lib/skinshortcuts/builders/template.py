@@ -5,21 +5,29 @@ Builds Kodi include XML from templates.xml and menu data.
 
 from __future__ import annotations
 
-import copy
 import re
 import xml.etree.ElementTree as ET
+from collections import ChainMap
+from functools import lru_cache
 from typing import TYPE_CHECKING
 
-from ..conditions import evaluate_condition
+from ..conditions import (
+    evaluate_condition,
+    evaluate_condition_uncached,
+    referenced_properties,
+)
 from ..constants import extract_path_from_action
 from ..expressions import process_if_expressions, process_math_expressions
 from ..loaders.base import NO_SUFFIX_PROPERTIES, apply_suffix_to_from, apply_suffix_transform
 from ..log import get_logger, notify
-from ..models.template import BuildMode, TemplateProperty
+from ..models.template import BuildMode
+from .base import clone_element, indent_xml
 
 log = get_logger("TemplateBuilder")
 
 if TYPE_CHECKING:
+    from collections.abc import Mapping
+
     from ..models import Menu, MenuItem
     from ..models.property import PropertySchema
     from ..models.template import (
@@ -28,9 +36,11 @@ if TYPE_CHECKING:
         PresetGroupReference,
         PresetReference,
         PropertyGroup,
+        PropertyGroupReference,
         SubmenuTemplate,
         Template,
         TemplateOutput,
+        TemplateProperty,
         TemplateSchema,
         TemplateVar,
         VariableDefinition,
@@ -41,6 +51,64 @@ _PROPERTY_PATTERN = re.compile(r"\$PROPERTY\[([^\]]+)\]")
 _PARENT_PATTERN = re.compile(r"\$PARENT\[([^\]]+)\]")
 _EXP_PATTERN = re.compile(r"\$EXP\[([^\]]+)\]")
 _INCLUDE_PATTERN = re.compile(r"\$INCLUDE\[([^\]]+)\]")
+_TEMPLATE_INCLUDE_PATTERN = re.compile(r"\$INCLUDE\[skinshortcuts-template-([^\]]+)\]")
+_NOSUFFIX_PATTERN = re.compile(r"\{NOSUFFIX:([^}]+)\}")
+_CONDITION_SEPARATOR_PATTERN = re.compile(r"[=~|+\[\]!]")
+# Built-ins that never take a suffix in conditions
+_SUFFIX_RESERVED = frozenset({"index", "name", "menu", "id", "idprefix", "suffix"})
+# Template output can run to megabytes; flush in large chunks
+_WRITE_BUFFER_SIZE = 1 << 20
+# Built-ins that from="..." sources read from the context only
+_SOURCE_BUILTINS = frozenset({"index", "name", "menu", "id", "idprefix"})
+
+
+def _suffix_token(part: str, suffix: str, in_value: bool) -> str:
+    """Suffix a property-name token from a condition, leaving values and built-ins alone."""
+    if in_value or part in _SUFFIX_RESERVED or part.startswith("__NOSUFFIX_"):
+        return part
+    return f"{part}{suffix}"
+
+
+@lru_cache(maxsize=4096)
+def _reference_plan(pattern: re.Pattern[str], text: str) -> tuple[str, ...]:
+    """Split text on a single-group reference pattern; names sit at the odd indexes."""
+    return tuple(pattern.split(text))
+
+
+def _substitute_properties(
+    text: str, context: dict[str, str], properties: dict[str, str]
+) -> str:
+    """Replace $PROPERTY[name] with its context value, else the item property, else "".
+
+    The same schema strings are substituted for every item, so the split
+    is cached and only the name slots are filled per call.
+    """
+    parts = list(_reference_plan(_PROPERTY_PATTERN, text))
+    # Values are always strings, so None from get() means "not in context"
+    get_context = context.get
+    get_property = properties.get
+    for i in range(1, len(parts), 2):
+        value = get_context(parts[i])
+        parts[i] = value if value is not None else get_property(parts[i], "")
+    return "".join(parts)
+
+
+def _substitute_parent(
+    text: str, parent_context: dict[str, str] | None, parent_item: MenuItem
+) -> str:
+    """Replace $PARENT[name] from the parent context, then the parent item, else ""."""
+    parts = list(_reference_plan(_PARENT_PATTERN, text))
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        if parent_context and name in parent_context:
+            parts[i] = parent_context[name]
+        elif name == "label":
+            parts[i] = parent_item.label
+        elif name == "name":
+            parts[i] = parent_item.name
+        else:
+            parts[i] = parent_item.properties.get(name, "")
+    return "".join(parts)
 
 
 class TemplateBuilder:
@@ -57,6 +125,24 @@ class TemplateBuilder:
         self.property_schema = property_schema
         self._menu_map: dict[str, Menu] = {m.name: m for m in menus}
         self._assigned_templates: set[str] = self._collect_assigned_templates()
+        # Conditions and $EXP refs come from the fixed schema; memoize their rewrites
+        self._expand_cache: dict[str, str] = {}
+        self._suffix_condition_cache: dict[tuple[str, str], str] = {}
+        self._strip_nosuffix_cache: dict[str, str] = {}
+        self._compiled_conditions: dict[tuple[str, str], str] = {}
+        self._enabled_cache: dict[int, list[tuple[int, MenuItem]]] = {}
+        self._item_suffixes: dict[int, set[str]] = {}
+        self._base_contexts: dict[int, dict[str, str]] = {}
+        self._matching_cache: dict[
+            tuple[str, tuple[str, ...], frozenset[str]], list[tuple[Menu, int, MenuItem]]
+        ] = {}
+        self._condition_results: dict[tuple[str, tuple[str | None, ...]], bool] = {}
+        # Preset rows with compiled conditions, keyed by (id(preset), suffix)
+        self._preset_tables: dict[
+            tuple[int, str], list[tuple[str, tuple[str, ...], dict[str, str]]]
+        ] = {}
+        # Processed schema controls with no substitutions, keyed by id of the source
+        self._static_controls: dict[int, ET.Element | None] = {}
 
     def _collect_assigned_templates(self) -> set[str]:
         """Collect template include names that are actually assigned to menu items.
@@ -65,15 +151,16 @@ class TemplateBuilder:
         $INCLUDE[skinshortcuts-template-*] references.
         """
         assigned: set[str] = set()
-        include_pattern = re.compile(r"\$INCLUDE\[skinshortcuts-template-([^\]]+)\]")
 
         for menu in self.menus:
             for item in menu.items:
-                for _prop_name, prop_value in item.properties.items():
-                    if not prop_value:
+                for prop_value in item.properties.values():
+                    if not prop_value or "$INCLUDE[skinshortcuts-template-" not in prop_value:
                         continue
-                    for match in include_pattern.finditer(prop_value):
-                        assigned.add(f"skinshortcuts-template-{match.group(1)}")
+                    assigned.update(
+                        f"skinshortcuts-template-{name}"
+                        for name in _TEMPLATE_INCLUDE_PATTERN.findall(prop_value)
+                    )
 
         return assigned
 
@@ -89,19 +176,18 @@ class TemplateBuilder:
         include_map: dict[str, ET.Element] = {}
         variable_map: dict[str, ET.Element] = {}
 
-        # templateonly: "true" = never generate, "auto" = skip if unassigned
-        template_only_settings: dict[str, str] = {}
+        skipped_includes = self._skipped_includes()
 
         for template in self.schema.templates:
             for output in template.get_outputs():
                 include_name = f"skinshortcuts-template-{output.include}"
 
-                if template.template_only:
-                    template_only_settings[include_name] = template.template_only
+                # Skipped includes are never output; only their variables can be
+                if include_name in skipped_includes and not self._emits_variables(template):
+                    continue
 
                 if include_name not in include_map:
-                    include_elem = ET.Element("include")
-                    include_elem.set("name", include_name)
+                    include_elem = ET.Element("include", {"name": include_name})
                     include_map[include_name] = include_elem
 
                 include_elem = include_map[include_name]
@@ -117,24 +203,57 @@ class TemplateBuilder:
         for submenu_tpl in self.schema.submenus:
             self._build_submenu_template(submenu_tpl, include_map)
 
-        for var_elem in variable_map.values():
-            root.append(var_elem)
+        root.extend(variable_map.values())
 
-        for include_name, include_elem in include_map.items():
-            setting = template_only_settings.get(include_name, "")
-            if setting == "true":
-                continue
-            if setting == "auto" and include_name not in self._assigned_templates:
-                continue
+        includes = [
+            include_elem
+            for include_name, include_elem in include_map.items()
+            if include_name not in skipped_includes
+        ]
+        for include_elem in includes:
             if len(include_elem) == 0:
                 desc = ET.SubElement(include_elem, "description")
                 desc.text = (
                     "Automatically generated - no menu items matched this template (see log)"
                 )
-            root.append(include_elem)
+        root.extend(includes)
 
         return root
 
+    def _skipped_includes(self) -> set[str]:
+        """Collect template include names suppressed by templateonly.
+
+        templateonly: "true" = never generate, "auto" = skip if unassigned.
+        The last template that sets templateonly for an include name wins.
+        """
+        template_only_settings: dict[str, str] = {}
+        for template in self.schema.templates:
+            if template.template_only:
+                for output in template.get_outputs():
+                    include_name = f"skinshortcuts-template-{output.include}"
+                    template_only_settings[include_name] = template.template_only
+
+        return {
+            include_name
+            for include_name, setting in template_only_settings.items()
+            if setting == "true"
+            or (setting == "auto" and include_name not in self._assigned_templates)
+        }
+
+    def _emits_variables(self, template: Template) -> bool:
+        """Check if building a template can add root-level variables.
+
+        Variables come from the template's own definitions and groups, or from
+        items insertions whose definitions reference variable groups.
+        """
+        if template.variables or template.variable_groups:
+            return True
+        if template.controls is None:
+            return False
+        if not any(d.variable_groups for d in self.schema.items_templates.values()):
+            return False
+        return any(child.tag == "skinshortcuts" for child in template.controls.iter())
+
     def _build_submenu_template(
         self,
         submenu_tpl: SubmenuTemplate,
@@ -151,8 +270,7 @@ class TemplateBuilder:
 
         include_name = f"skinshortcuts-{submenu_tpl.include}"
         if include_name not in include_map:
-            include_elem = ET.Element("include")
-            include_elem.set("name", include_name)
+            include_elem = ET.Element("include", {"name": include_name})
             include_map[include_name] = include_elem
         include_elem = include_map[include_name]
 
@@ -220,8 +338,7 @@ class TemplateBuilder:
         """Process submenu template controls and append to target element."""
         if submenu_tpl.controls is None:
             return
-        controls_copy = copy.deepcopy(submenu_tpl.controls)
-        for child in list(controls_copy):
+        for child in submenu_tpl.controls:
             processed = self._process_submenu_controls(child, context, menu, parent_item)
             if processed is not None:
                 self._append_processed(target, processed)
@@ -230,8 +347,7 @@ class TemplateBuilder:
     def _append_processed(parent: ET.Element, elem: ET.Element) -> None:
         """Append a processed element, unwrapping _container wrappers."""
         if elem.tag == "_container":
-            for child in elem:
-                parent.append(child)
+            parent.extend(elem)
         else:
             parent.append(elem)
 
@@ -298,33 +414,36 @@ class TemplateBuilder:
         menu: Menu,
         parent_item: MenuItem | None = None,
     ) -> ET.Element | None:
-        """Process controls from a submenu template."""
-        result = copy.deepcopy(elem)
+        """Process controls from a submenu template.
 
-        if result.text:
-            result.text = self._substitute_submenu_text(result.text, context)
-        if result.tail:
-            result.tail = self._substitute_submenu_text(result.tail, context)
+        Builds a shallow copy per level and appends processed children, so
+        the source subtree is never cloned wholesale or pruned in place.
+        """
+        result = ET.Element(elem.tag, elem.attrib)
 
-        for attr_name, attr_value in list(result.attrib.items()):
-            if attr_name.startswith("_"):
-                continue
-            result.set(attr_name, self._substitute_submenu_text(attr_value, context))
+        if elem.text:
+            result.text = self._substitute_submenu_text(elem.text, context)
+        if elem.tail:
+            result.tail = self._substitute_submenu_text(elem.tail, context)
+
+        attrib = result.attrib
+        for attr_name, attr_value in attrib.items():
+            if "$" in attr_value and not attr_name.startswith("_"):
+                attrib[attr_name] = self._substitute_submenu_text(attr_value, context)
 
         insert_attr = result.get("_skinshortcuts_insert")
         if insert_attr or result.tag == "skinshortcuts":
             insert_name = insert_attr or result.get("insert", "")
             if insert_name:
-                items_def = self.schema.get_items_template(insert_name)
+                items_def = self.schema.items_templates.get(insert_name)
                 if items_def:
                     container = ET.Element("_container")
                     self._expand_submenu_items(items_def, menu, container, context, parent_item)
                     return container
             return None
 
-        for child in list(result):
+        for child in elem:
             processed = self._process_submenu_controls(child, context, menu, parent_item)
-            result.remove(child)
             if processed is not None:
                 self._append_processed(result, processed)
 
@@ -332,17 +451,14 @@ class TemplateBuilder:
 
     def _substitute_submenu_text(self, text: str, context: dict[str, str]) -> str:
         """Substitute $PROPERTY[...] and $EXP[...] in submenu template text."""
-        def replace_property(m: re.Match[str]) -> str:
-            return context.get(m.group(1), "")
-
         def replace_exp(m: re.Match[str]) -> str:
             exp_name = m.group(1)
-            expr = self.schema.get_expression(exp_name)
+            expr = self.schema.expressions.get(exp_name)
             if expr:
                 return expr.value
             return m.group(0)
 
-        text = _PROPERTY_PATTERN.sub(replace_property, text)
+        text = _substitute_properties(text, context, {})
         text = _EXP_PATTERN.sub(replace_exp, text)
         text = process_math_expressions(text, context)
         return text
@@ -367,7 +483,7 @@ class TemplateBuilder:
 
             if items_def.controls is not None:
                 for child in items_def.controls:
-                    cloned = copy.deepcopy(child)
+                    cloned = clone_element(child)
                     self._process_items_element(
                         cloned, sub_context, parent_context or {}, item, parent_item
                     )
@@ -397,7 +513,7 @@ class TemplateBuilder:
 
         if not template.has_transformations:
             for child in template.controls:
-                cloned = copy.deepcopy(child)
+                cloned = clone_element(child)
                 self._resolve_raw_visibility(cloned, matching)
                 include.append(cloned)
             return
@@ -415,7 +531,7 @@ class TemplateBuilder:
         for item, menu, idx in matching:
             context = self._build_context(template, output, item, idx, menu)
 
-            resolved = copy.deepcopy(template.controls)
+            resolved = clone_element(template.controls)
             self._substitute_raw_controls(resolved, context, item)
 
             key: str = ET.tostring(resolved, encoding="unicode")  # type: ignore[assignment]
@@ -444,6 +560,7 @@ class TemplateBuilder:
         self, template: Template
     ) -> list[tuple[MenuItem, Menu, int]]:
         """Collect menu items matching a raw template's filters."""
+        conditions = self._prepare_template_conditions(template.conditions, "")
         matching: list[tuple[MenuItem, Menu, int]] = []
         for menu in self.menus:
             if template.menu and menu.name != template.menu:
@@ -457,12 +574,9 @@ class TemplateBuilder:
                         f"Add container= to the menu, or drop build=\"true\" to iterate items."
                     )
                 continue
-            for idx, item in enumerate(menu.items, start=1):
-                if item.disabled:
-                    continue
-                if not self._check_conditions(template.conditions, item):
-                    continue
-                matching.append((item, menu, idx))
+            for idx, item in self._enabled_items(menu):
+                if self._template_conditions_match(conditions, item.properties):
+                    matching.append((item, menu, idx))
         return matching
 
     def _substitute_raw_controls(
@@ -487,8 +601,10 @@ class TemplateBuilder:
                 child.text = self._substitute_text(child.text, context, item)
             if child.tail:
                 child.tail = self._substitute_text(child.tail, context, item)
-            for attr, value in list(child.attrib.items()):
-                child.set(attr, self._substitute_text(value, context, item))
+            attrib = child.attrib
+            for attr, value in attrib.items():
+                if "$" in value:
+                    attrib[attr] = self._substitute_text(value, context, item)
             self._substitute_raw_controls(child, context, item)
 
     def _resolve_raw_visibility(
@@ -524,40 +640,79 @@ class TemplateBuilder:
         The output's suffix is applied to all conditions and references,
         allowing one template to generate multiple includes.
         """
+        for menu, idx, item in self._matching_items(template, output.suffix):
+            context = self._build_context(template, output, item, idx, menu)
+
+            if template.controls is not None:
+                controls = self._process_controls(
+                    template.controls, context, item, menu, variable_map, output.suffix
+                )
+                if controls is not None:
+                    include.extend(controls)
+
+            for var_def in template.variables:
+                var_elem = self._build_variable(var_def, context, item)
+                if var_elem is not None:
+                    self._add_variable(var_elem, variable_map)
+
+            for group_ref in template.variable_groups:
+                effective_suffix = self._combine_suffixes(output.suffix, group_ref.suffix)
+                self._build_variable_group(
+                    group_ref, context, item, variable_map, effective_suffix
+                )
+
+    def _matching_items(
+        self, template: Template, suffix: str
+    ) -> list[tuple[Menu, int, MenuItem]]:
+        """Collect enabled items that pass the template's conditions for an output.
+
+        Conditions and insert names depend only on the template and suffix, so
+        they are prepared once and checked against every candidate item.
+        Templates that share a menu filter, compiled conditions and insert
+        names share one result list.
+        """
+        conditions = self._prepare_template_conditions(template.conditions, suffix)
+        insert_names = (
+            self._find_insert_names(template.controls) if template.controls is not None else None
+        )
+        key = (
+            template.menu,
+            tuple([compiled for compiled, _ in conditions]),
+            frozenset(insert_names or ()),
+        )
+        cached = self._matching_cache.get(key)
+        if cached is not None:
+            return cached
+
+        matching: list[tuple[Menu, int, MenuItem]] = []
         for menu in self.menus:
             if template.menu and menu.name != template.menu:
                 continue
 
-            for idx, item in enumerate(menu.items, start=1):
-                if item.disabled:
+            for idx, item in self._enabled_items(menu):
+                if not self._template_conditions_match(conditions, item.properties):
                     continue
 
-                if not self._check_conditions(template.conditions, item, output.suffix):
+                if insert_names and not self._has_required_submenus(insert_names, item):
                     continue
 
-                if not self._has_required_submenus(template, item):
-                    continue
+                matching.append((menu, idx, item))
+        self._matching_cache[key] = matching
+        return matching
 
-                context = self._build_context(template, output, item, idx, menu)
+    def _enabled_items(self, menu: Menu) -> list[tuple[int, MenuItem]]:
+        """Enabled items of a menu with their 1-based index among all items.
 
-                if template.controls is not None:
-                    controls = self._process_controls(
-                        template.controls, context, item, menu, variable_map, output.suffix
-                    )
-                    if controls is not None:
-                        for child in controls:
-                            include.append(child)
-
-                for var_def in template.variables:
-                    var_elem = self._build_variable(var_def, context, item)
-                    if var_elem is not None:
-                        self._add_variable(var_elem, variable_map)
-
-                for group_ref in template.variable_groups:
-                    effective_suffix = self._combine_suffixes(output.suffix, group_ref.suffix)
-                    self._build_variable_group(
-                        group_ref, context, item, variable_map, effective_suffix
-                    )
+        Indexes include disabled items so template ids stay stable. Built once
+        per menu and shared by every template and output that targets it.
+        """
+        enabled = self._enabled_cache.get(id(menu))
+        if enabled is None:
+            enabled = [
+                (idx, item) for idx, item in enumerate(menu.items, start=1) if not item.disabled
+            ]
+            self._enabled_cache[id(menu)] = enabled
+        return enabled
 
     def _combine_suffixes(self, base_suffix: str, ref_suffix: str) -> str:
         """Combine output suffix with reference suffix.
@@ -580,7 +735,7 @@ class TemplateBuilder:
         The output's suffix is applied to all property/preset/variableGroup
         references, allowing one template to serve multiple widget slots.
         """
-        context: dict[str, str] = {**menu.defaults.properties, **item.properties}
+        context = self._base_context(item, menu)
 
         context["index"] = str(idx)
         context["name"] = item.name
@@ -616,42 +771,57 @@ class TemplateBuilder:
                 context[var.name] = value
 
         for ref in template.preset_refs:
-            effective_suffix = self._combine_suffixes(output.suffix, ref.suffix)
-            condition = ref.condition
-            if condition:
-                condition = self._expand_expressions(condition)
-                if effective_suffix:
-                    condition = self._apply_suffix_to_condition(condition, effective_suffix)
-                if not self._eval_condition(condition, item, context):
-                    continue
-            self._apply_preset(ref, item, context, effective_suffix)
+            matched, effective_suffix = self._check_ref_condition(ref, output.suffix, item, context)
+            if matched:
+                self._apply_preset(ref, item, context, effective_suffix)
 
         for ref in template.preset_group_refs:
-            effective_suffix = self._combine_suffixes(output.suffix, ref.suffix)
-            condition = ref.condition
-            if condition:
-                condition = self._expand_expressions(condition)
-                if effective_suffix:
-                    condition = self._apply_suffix_to_condition(condition, effective_suffix)
-                if not self._eval_condition(condition, item, context):
-                    continue
-            self._apply_preset_group(ref, item, context, effective_suffix)
+            matched, effective_suffix = self._check_ref_condition(ref, output.suffix, item, context)
+            if matched:
+                self._apply_preset_group(ref, item, context, effective_suffix)
 
         for ref in template.property_groups:
-            effective_suffix = self._combine_suffixes(output.suffix, ref.suffix)
-            condition = ref.condition
-            if condition:
-                condition = self._expand_expressions(condition)
-                if effective_suffix:
-                    condition = self._apply_suffix_to_condition(condition, effective_suffix)
-                if not self._eval_condition(condition, item, context):
-                    continue
-            prop_group = self.schema.get_property_group(ref.name)
+            matched, effective_suffix = self._check_ref_condition(ref, output.suffix, item, context)
+            if not matched:
+                continue
+            prop_group = self.schema.property_groups.get(ref.name)
             if prop_group:
                 self._apply_property_group(prop_group, item, context, effective_suffix)
 
         return context
 
+    def _base_context(self, item: MenuItem, menu: Menu) -> dict[str, str]:
+        """Return a fresh copy of the menu defaults merged with item properties.
+
+        The merge is done once per item; every context built for it starts
+        from a copy.
+        """
+        base = self._base_contexts.get(id(item))
+        if base is None:
+            base = {**menu.defaults.properties, **item.properties}
+            self._base_contexts[id(item)] = base
+        return base.copy()
+
+    def _check_ref_condition(
+        self,
+        ref: PresetReference | PresetGroupReference | PropertyGroupReference,
+        base_suffix: str,
+        item: MenuItem,
+        context: dict[str, str],
+    ) -> tuple[bool, str]:
+        """Check a reference's condition under its effective suffix.
+
+        Returns (matched, effective_suffix); the suffix is the reference's own
+        when set, otherwise the output's.
+        """
+        effective_suffix = self._combine_suffixes(base_suffix, ref.suffix)
+        if not ref.condition:
+            return True, effective_suffix
+        return (
+            self._condition_matches(ref.condition, item, context, effective_suffix),
+            effective_suffix,
+        )
+
     def _build_variable(
         self,
         var_def: VariableDefinition,
@@ -666,16 +836,14 @@ class TemplateBuilder:
         When parent context/item are supplied (items-template scope), $PARENT[...]
         and $MATH[...] also resolve in the output name and content.
         """
-        if var_def.condition:
-            condition = self._expand_expressions(var_def.condition)
-            if not self._eval_condition(condition, item, context):
-                return None
+        if var_def.condition and not self._condition_matches(var_def.condition, item, context):
+            return None
 
-        if var_def.content is None:
+        content = var_def.content
+        if content is None:
             return None
-        var_elem = copy.deepcopy(var_def.content)
 
-        raw_name = var_def.output or var_elem.get("name") or var_def.name
+        raw_name = var_def.output or content.get("name") or var_def.name
         if parent_item is not None:
             output_name = self._substitute_text(
                 raw_name, context, item, None, parent_context, parent_item
@@ -683,12 +851,18 @@ class TemplateBuilder:
         else:
             output_name = self._substitute_property_refs(raw_name, item, context)
 
-        var_elem.set("name", output_name)
         # output/condition are build-time directives; drop them so they don't leak into Kodi XML
-        if "output" in var_elem.attrib:
-            del var_elem.attrib["output"]
-        if "condition" in var_elem.attrib:
-            del var_elem.attrib["condition"]
+        attrib = {
+            key: value
+            for key, value in content.attrib.items()
+            if key not in ("output", "condition")
+        }
+        attrib["name"] = output_name
+        var_elem = ET.Element(content.tag, attrib)
+        var_elem.text = content.text
+        var_elem.tail = content.tail
+        var_elem.extend([clone_element(child) for child in content])
+
         self._expand_iterate_values(var_elem, item, context)
         self._substitute_variable_content(
             var_elem, context, item, parent_context, parent_item
@@ -729,7 +903,7 @@ class TemplateBuilder:
             suffixes = self._resolve_iterate_suffixes(resolved, item)
 
             for idx, suffix in enumerate(suffixes, start=1):
-                expanded = copy.deepcopy(child)
+                expanded = clone_element(child)
                 if expanded.text:
                     expanded.text = self._apply_iterate_to_text(expanded.text, suffix, idx, as_name)
                 if "condition" in expanded.attrib:
@@ -738,10 +912,7 @@ class TemplateBuilder:
                     )
                 new_children.append(expanded)
 
-        for old in list(var_elem):
-            var_elem.remove(old)
-        for new_child in new_children:
-            var_elem.append(new_child)
+        var_elem[:] = new_children
 
     @staticmethod
     def _resolve_iterate_suffixes(expr: str, item: MenuItem) -> list[str]:
@@ -760,22 +931,23 @@ class TemplateBuilder:
     @staticmethod
     def _apply_iterate_to_text(text: str, suffix: str, index: int, as_name: str) -> str:
         """Resolve loop-locals and auto-suffix other $PROPERTY refs."""
-        if not text:
+        if not text or "$PROPERTY[" not in text:
             return text
         index_key = f"{as_name}Index"
         suffix_key = f"{as_name}Suffix"
 
-        def replace(match: re.Match) -> str:
-            name = match.group(1)
+        parts = list(_reference_plan(_PROPERTY_PATTERN, text))
+        for i in range(1, len(parts), 2):
+            name = parts[i]
             if name == index_key:
-                return str(index)
-            if name == suffix_key:
-                return suffix
-            if name in NO_SUFFIX_PROPERTIES or not suffix:
-                return match.group(0)
-            return f"$PROPERTY[{name}{suffix}]"
-
-        return _PROPERTY_PATTERN.sub(replace, text)
+                parts[i] = str(index)
+            elif name == suffix_key:
+                parts[i] = suffix
+            elif name in NO_SUFFIX_PROPERTIES or not suffix:
+                parts[i] = f"$PROPERTY[{name}]"
+            else:
+                parts[i] = f"$PROPERTY[{name}{suffix}]"
+        return "".join(parts)
 
     def _add_variable(
         self,
@@ -792,8 +964,7 @@ class TemplateBuilder:
             return
 
         if var_name in variable_map:
-            for child in var_elem:
-                variable_map[var_name].append(child)
+            variable_map[var_name].extend(var_elem)
         else:
             variable_map[var_name] = var_elem
 
@@ -817,12 +988,10 @@ class TemplateBuilder:
         parent_context/parent_item: Items-template scope; enables $PARENT[...] in
         variable output and content.
         """
-        if group_ref.condition:
-            condition = self._expand_expressions(group_ref.condition)
-            if not self._eval_condition(condition, item, context):
-                return
+        if group_ref.condition and not self._condition_matches(group_ref.condition, item, context):
+            return
 
-        var_group = self.schema.get_variable_group(group_ref.name)
+        var_group = self.schema.variable_groups.get(group_ref.name)
         if not var_group:
             return
 
@@ -843,12 +1012,10 @@ class TemplateBuilder:
             if suffix and condition:
                 condition = apply_suffix_transform(condition, suffix)
 
-            if condition:
-                condition = self._expand_expressions(condition)
-                if not self._eval_condition(condition, item, context):
-                    continue
+            if condition and not self._condition_matches(condition, item, context):
+                continue
 
-            var_def = self.schema.get_variable_definition(var_ref.name)
+            var_def = self.schema.variable_definitions.get(var_ref.name)
             if not var_def:
                 continue
 
@@ -864,27 +1031,24 @@ class TemplateBuilder:
         parent_context: dict[str, str] | None = None,
         parent_item: MenuItem | None = None,
     ) -> None:
-        """Substitute $EXP/$PROPERTY/$MATH/$IF in variable content recursively.
+        """Substitute $EXP/$PROPERTY/$MATH/$IF in variable content.
 
         $PARENT[...] also resolves when parent_item is supplied (items-template scope).
+        Every marker starts with "$", so strings without one are left untouched.
         """
-        if elem.text:
-            elem.text = self._substitute_text(
-                elem.text, context, item, None, parent_context, parent_item
-            )
-        if elem.tail:
-            elem.tail = self._substitute_text(
-                elem.tail, context, item, None, parent_context, parent_item
-            )
-        for attr, value in list(elem.attrib.items()):
-            elem.set(
-                attr,
-                self._substitute_text(value, context, item, None, parent_context, parent_item),
-            )
-        for child in elem:
-            self._substitute_variable_content(
-                child, context, item, parent_context, parent_item
-            )
+        substitute = self._substitute_text
+        for node in elem.iter():
+            text = node.text
+            if text and "$" in text:
+                node.text = substitute(text, context, item, None, parent_context, parent_item)
+            tail = node.tail
+            if tail and "$" in tail:
+                node.tail = substitute(tail, context, item, None, parent_context, parent_item)
+            for attr, value in node.attrib.items():
+                if "$" in value:
+                    node.attrib[attr] = substitute(
+                        value, context, item, None, parent_context, parent_item
+                    )
 
     def _resolve_property(
         self,
@@ -897,18 +1061,14 @@ class TemplateBuilder:
 
         When suffix is provided, it's applied to condition property names.
         """
-        if prop.condition:
-            condition = self._expand_expressions(prop.condition)
-            if suffix:
-                condition = self._apply_suffix_to_condition(condition, suffix)
-            if not self._eval_condition(condition, item, context):
-                return None
+        if prop.condition and not self._condition_matches(prop.condition, item, context, suffix):
+            return None
 
         if prop.from_source:
             source = prop.from_source
             if suffix:
                 source = apply_suffix_to_from(source, suffix)
-            return self._get_from_source(source, item, context, suffix)
+            return self._get_from_source(source, item, context)
 
         value = prop.value
         if "$PROPERTY[" in value:
@@ -922,16 +1082,9 @@ class TemplateBuilder:
         context: dict[str, str],
     ) -> str:
         """Substitute $PROPERTY[...] in text during context building."""
-
-        def replace_property(match: re.Match) -> str:
-            name = match.group(1)
-            if name in context:
-                return context[name]
-            if name in item.properties:
-                return item.properties[name]
-            return ""
-
-        return _PROPERTY_PATTERN.sub(replace_property, text)
+        if "$PROPERTY[" not in text:
+            return text
+        return _substitute_properties(text, context, item.properties)
 
     def _substitute_parent_refs(
         self,
@@ -940,20 +1093,9 @@ class TemplateBuilder:
         parent_item: MenuItem,
     ) -> str:
         """Substitute $PARENT[...] in text during items template processing."""
-
-        def replace_parent(match: re.Match) -> str:
-            name = match.group(1)
-            if parent_context and name in parent_context:
-                return parent_context[name]
-            if name == "label":
-                return parent_item.label
-            if name == "name":
-                return parent_item.name
-            if name in parent_item.properties:
-                return parent_item.properties[name]
-            return ""
-
-        return _PARENT_PATTERN.sub(replace_parent, text)
+        if "$PARENT[" not in text:
+            return text
+        return _substitute_parent(text, parent_context, parent_item)
 
     def _resolve_var(
         self,
@@ -968,12 +1110,10 @@ class TemplateBuilder:
         Substitutes $PROPERTY[...] references in the resolved value.
         """
         for val in var.values:
-            if val.condition:
-                condition = self._expand_expressions(val.condition)
-                if suffix:
-                    condition = self._apply_suffix_to_condition(condition, suffix)
-                if not self._eval_condition(condition, item, context):
-                    continue
+            if val.condition and not self._condition_matches(
+                val.condition, item, context, suffix
+            ):
+                continue
 
             value = val.value
             if "$PROPERTY[" in value:
@@ -986,13 +1126,17 @@ class TemplateBuilder:
         source: str,
         item: MenuItem,
         context: dict[str, str],
-        suffix: str = "",
     ) -> str:
-        """Get value from a source (built-in or item property)."""
-        if source in ("index", "name", "menu", "id", "idprefix"):
-            return context.get(source, "")
-        if source in context:
-            return context[source]
+        """Get value from a source (built-in or item property).
+
+        Built-ins never fall back to item properties, even when the context
+        does not define them (items-template contexts have no id/idprefix).
+        """
+        value = context.get(source)
+        if value is not None:
+            return value
+        if source in _SOURCE_BUILTINS:
+            return ""
         return item.properties.get(source, "")
 
     def _apply_property_group(
@@ -1004,24 +1148,9 @@ class TemplateBuilder:
     ) -> None:
         """Apply properties from a property group to context."""
         for prop in prop_group.properties:
-            from_source = prop.from_source
-            condition = prop.condition
-
-            if suffix:
-                if from_source:
-                    from_source = apply_suffix_to_from(from_source, suffix)
-                if condition:
-                    condition = self._expand_expressions(condition)
-                    condition = self._apply_suffix_to_condition(condition, suffix)
-
-            modified_prop = TemplateProperty(
-                name=prop.name,
-                value=prop.value,
-                from_source=from_source,
-                condition=condition,
-            )
-            value = self._resolve_property(modified_prop, item, context)
-            if value is not None and (from_source or prop.name not in context):
+            # _resolve_property suffixes the condition and from source itself
+            value = self._resolve_property(prop, item, context, suffix)
+            if value is not None and (prop.from_source or prop.name not in context):
                 context[prop.name] = value
 
         for var in prop_group.vars:
@@ -1047,27 +1176,17 @@ class TemplateBuilder:
 
         override_suffix: If provided, overrides the ref's suffix.
         """
-        preset = self.schema.get_preset(ref.name)
+        preset = self.schema.presets.get(ref.name)
         if not preset:
             return
 
         suffix = override_suffix if override_suffix else ref.suffix
 
-        for row in preset.rows:
-            if row.condition:
-                condition = self._expand_expressions(row.condition)
-                if suffix:
-                    condition = self._apply_suffix_to_condition(condition, suffix)
-                if self._eval_condition(condition, item, context):
-                    for attr_name, attr_value in row.values.items():
-                        if attr_name not in context:
-                            context[attr_name] = attr_value
-                    return
-            else:
-                for attr_name, attr_value in row.values.items():
-                    if attr_name not in context:
-                        context[attr_name] = attr_value
-                return
+        values = self._get_preset_values(preset, item, context, suffix)
+        if values:
+            for attr_name, attr_value in values.items():
+                if attr_name not in context:
+                    context[attr_name] = attr_value
 
     def _apply_preset_group(
         self,
@@ -1083,22 +1202,20 @@ class TemplateBuilder:
 
         override_suffix: If provided, overrides the ref's suffix.
         """
-        group = self.schema.get_preset_group(ref.name)
+        group = self.schema.preset_groups.get(ref.name)
         if not group:
             return
 
         suffix = override_suffix if override_suffix else ref.suffix
 
         for child in group.children:
-            if child.condition:
-                condition = self._expand_expressions(child.condition)
-                if suffix:
-                    condition = self._apply_suffix_to_condition(condition, suffix)
-                if not self._eval_condition(condition, item, context):
-                    continue
+            if child.condition and not self._condition_matches(
+                child.condition, item, context, suffix
+            ):
+                continue
 
             if child.preset_name:
-                preset = self.schema.get_preset(child.preset_name)
+                preset = self.schema.presets.get(child.preset_name)
                 if preset:
                     values = self._get_preset_values(preset, item, context, suffix)
                     if values:
@@ -1120,17 +1237,35 @@ class TemplateBuilder:
         suffix: str = "",
     ) -> dict[str, str] | None:
         """Get matching values from a preset (first matching row)."""
-        for row in preset.rows:
-            if row.condition:
-                condition = self._expand_expressions(row.condition)
-                if suffix:
-                    condition = self._apply_suffix_to_condition(condition, suffix)
-                if self._eval_condition(condition, item, context):
-                    return row.values
-            else:
-                return row.values
+        properties = ChainMap(context, item.properties)
+        for compiled, names, values in self._preset_table(preset, suffix):
+            if not compiled or self._evaluate_compiled(compiled, names, properties):
+                return values
         return None
 
+    def _preset_table(
+        self,
+        preset: Preset,
+        suffix: str,
+    ) -> list[tuple[str, tuple[str, ...], dict[str, str]]]:
+        """Return preset rows as (compiled condition, read names, values).
+
+        Rows are compiled once per (preset, suffix) so per-item scans skip
+        condition rewriting. Unconditional rows have an empty condition.
+        """
+        key = (id(preset), suffix)
+        table = self._preset_tables.get(key)
+        if table is None:
+            table = []
+            for row in preset.rows:
+                if row.condition:
+                    compiled = self._compile_condition(row.condition, suffix)
+                    table.append((compiled, referenced_properties(compiled), row.values))
+                else:
+                    table.append(("", (), row.values))
+            self._preset_tables[key] = table
+        return table
+
     def _apply_fallbacks(
         self,
         item: MenuItem,
@@ -1147,12 +1282,16 @@ class TemplateBuilder:
         if not self.property_schema:
             return
 
-        suffixes_in_use = {""}
-        for prop_name in item.properties:
-            if "." in prop_name:
-                parts = prop_name.rsplit(".", 1)
-                if parts[1].isdigit():
-                    suffixes_in_use.add(f".{parts[1]}")
+        # Item properties don't change during a build; reuse across templates
+        suffixes_in_use = self._item_suffixes.get(id(item))
+        if suffixes_in_use is None:
+            suffixes_in_use = {""}
+            for prop_name in item.properties:
+                if "." in prop_name:
+                    parts = prop_name.rsplit(".", 1)
+                    if parts[1].isdigit():
+                        suffixes_in_use.add(f".{parts[1]}")
+            self._item_suffixes[id(item)] = suffixes_in_use
 
         for prop_name, fallback in self.property_schema.fallbacks.items():
             for suffix in suffixes_in_use:
@@ -1174,41 +1313,44 @@ class TemplateBuilder:
                         break
 
     def _apply_suffix_to_condition(self, condition: str, suffix: str) -> str:
+        """Apply suffix to property names in a condition (memoized per builder)."""
+        key = (condition, suffix)
+        transformed = self._suffix_condition_cache.get(key)
+        if transformed is None:
+            transformed = self._suffix_condition(condition, suffix)
+            self._suffix_condition_cache[key] = transformed
+        return transformed
+
+    @staticmethod
+    def _suffix_condition(condition: str, suffix: str) -> str:
         """Apply suffix to property names in a condition."""
-        nosuffix_pattern = re.compile(r"\{NOSUFFIX:([^}]+)\}")
         preserved: list[str] = []
 
         def extract_nosuffix(match: re.Match) -> str:
             preserved.append(match.group(1))
             return f"__NOSUFFIX_{len(preserved) - 1}__"
 
-        condition = nosuffix_pattern.sub(extract_nosuffix, condition)
+        condition = _NOSUFFIX_PATTERN.sub(extract_nosuffix, condition)
 
-        separators = {"=", "~", "|", "+", "[", "]", "!"}
-        reserved = ("index", "name", "menu", "id", "idprefix", "suffix")
-
-        result = []
+        result: list[str] = []
         # After = or ~ we are consuming a value list; `|` continues the list,
         # but + [ ] ! start a new condition term with a fresh property name.
         in_value = False
-        parts = re.split(r"([=~|+\[\]!])", condition)
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            if part in separators:
-                if part in ("=", "~"):
-                    in_value = True
-                elif part in ("+", "[", "]", "!"):
-                    in_value = False
-                result.append(part)
-                continue
-            if part in reserved or part.startswith("__NOSUFFIX_"):
-                result.append(part)
-                continue
-            if not in_value:
-                part = f"{part}{suffix}"
-            result.append(part)
+        start = 0
+        for match in _CONDITION_SEPARATOR_PATTERN.finditer(condition):
+            part = condition[start : match.start()].strip()
+            if part:
+                result.append(_suffix_token(part, suffix, in_value))
+            separator = match.group()
+            result.append(separator)
+            if separator in "=~":
+                in_value = True
+            elif separator != "|":
+                in_value = False
+            start = match.end()
+        part = condition[start:].strip()
+        if part:
+            result.append(_suffix_token(part, suffix, in_value))
 
         transformed = "".join(result)
 
@@ -1219,37 +1361,64 @@ class TemplateBuilder:
 
     def _strip_nosuffix_markers(self, condition: str) -> str:
         """Strip {NOSUFFIX:...} markers, keeping only the content."""
-        return re.sub(r"\{NOSUFFIX:([^}]+)\}", r"\1", condition)
+        stripped = self._strip_nosuffix_cache.get(condition)
+        if stripped is None:
+            stripped = _NOSUFFIX_PATTERN.sub(r"\1", condition)
+            self._strip_nosuffix_cache[condition] = stripped
+        return stripped
 
-    def _check_conditions(self, conditions: list[str], item: MenuItem, suffix: str = "") -> bool:
-        """Check if all template conditions match.
+    def _prepare_template_conditions(
+        self, conditions: list[str], suffix: str
+    ) -> list[tuple[str, tuple[str, ...]]]:
+        """Compile template conditions and pair each with the properties it reads.
 
         When suffix is provided, it's applied to property names in conditions
         (e.g., 'widgetPath' becomes 'widgetPath.2' with suffix='.2').
         """
+        prepared = []
         for cond in conditions:
-            expanded = self._expand_expressions(cond)
-            if suffix:
-                expanded = self._apply_suffix_to_condition(expanded, suffix)
-            if not self._eval_condition(expanded, item, {}):
+            compiled = self._compile_condition(cond, suffix)
+            prepared.append((compiled, referenced_properties(compiled)))
+        return prepared
+
+    def _template_conditions_match(
+        self,
+        prepared: list[tuple[str, tuple[str, ...]]],
+        properties: dict[str, str],
+    ) -> bool:
+        """Check prepared template conditions against item properties.
+
+        Results are cached on the values of the properties each condition
+        reads, so items that agree on those values (and conditions that read
+        nothing) are evaluated once.
+        """
+        for compiled, names in prepared:
+            if not self._evaluate_compiled(compiled, names, properties):
                 return False
         return True
 
-    def _has_required_submenus(self, template: Template, item: MenuItem) -> bool:
+    def _evaluate_compiled(
+        self,
+        compiled: str,
+        names: tuple[str, ...],
+        properties: Mapping[str, str],
+    ) -> bool:
+        """Evaluate a compiled condition, cached on the values of the properties it reads."""
+        key = (compiled, tuple([properties.get(name) for name in names]))
+        result = self._condition_results.get(key)
+        if result is None:
+            result = evaluate_condition_uncached(compiled, properties)
+            self._condition_results[key] = result
+        return result
+
+    def _has_required_submenus(self, insert_names: set[str], item: MenuItem) -> bool:
         """Check if menu item has required submenus for template's items insertions.
 
-        Scans template controls for <skinshortcuts insert="X"/> elements.
-        Returns True if no insertions required, or if any referenced submenu has items.
+        insert_names come from <skinshortcuts insert="X"/> elements in the
+        template controls. Returns True if any referenced submenu has items.
         """
-        if template.controls is None:
-            return True
-
-        insert_names = self._find_insert_names(template.controls)
-        if not insert_names:
-            return True
-
         for insert_name in insert_names:
-            items_def = self.schema.get_items_template(insert_name)
+            items_def = self.schema.items_templates.get(insert_name)
             if not items_def:
                 continue
 
@@ -1285,12 +1454,40 @@ class TemplateBuilder:
         Uses the shared evaluate_condition from loaders/property.py.
         Adds expression expansion ($EXP[name]) before evaluation.
         """
-        condition = self._expand_expressions(condition)
-        condition = self._strip_nosuffix_markers(condition)
+        compiled = self._compile_condition(condition)
+        return self._evaluate_compiled(
+            compiled, referenced_properties(compiled), ChainMap(context, item.properties)
+        )
+
+    def _condition_matches(
+        self,
+        condition: str,
+        item: MenuItem,
+        context: dict[str, str],
+        suffix: str = "",
+    ) -> bool:
+        """Evaluate a schema condition, applying suffix to its property names."""
+        compiled = self._compile_condition(condition, suffix)
+        return self._evaluate_compiled(
+            compiled, referenced_properties(compiled), ChainMap(context, item.properties)
+        )
 
-        properties = {**item.properties, **context}
+    def _compile_condition(self, condition: str, suffix: str = "") -> str:
+        """Return condition ready for evaluate_condition (memoized per builder).
 
-        return evaluate_condition(condition, properties)
+        Expands $EXP[...] references, applies suffix to property names and
+        strips {NOSUFFIX:...} markers. The result depends only on schema
+        strings, so it is computed once per (condition, suffix) pair.
+        """
+        key = (condition, suffix)
+        compiled = self._compiled_conditions.get(key)
+        if compiled is None:
+            compiled = self._expand_expressions(condition)
+            if suffix:
+                compiled = self._apply_suffix_to_condition(compiled, suffix)
+            compiled = self._strip_nosuffix_markers(self._expand_expressions(compiled))
+            self._compiled_conditions[key] = compiled
+        return compiled
 
     def _expand_expressions(self, condition: str) -> str:
         """Expand $EXP[name] references in a condition.
@@ -1298,10 +1495,20 @@ class TemplateBuilder:
         For nosuffix=True expressions, wraps the value in {NOSUFFIX:...} markers
         which _apply_suffix_to_condition will preserve unchanged.
         """
+        if "$EXP[" not in condition:
+            return condition
+        expanded = self._expand_cache.get(condition)
+        if expanded is None:
+            expanded = self._expand_expressions_uncached(condition)
+            self._expand_cache[condition] = expanded
+        return expanded
+
+    def _expand_expressions_uncached(self, condition: str) -> str:
+        """Expand $EXP[name] references without consulting the cache."""
 
         def replace_exp(match: re.Match) -> str:
             name = match.group(1)
-            expr = self.schema.get_expression(name)
+            expr = self.schema.expressions.get(name)
             if expr:
                 expanded = self._expand_expressions(expr.value)
                 if expr.nosuffix:
@@ -1320,22 +1527,59 @@ class TemplateBuilder:
         variable_map: dict[str, ET.Element] | None = None,
         output_suffix: str = "",
     ) -> ET.Element | None:
-        """Process controls XML, applying substitutions."""
-        result = copy.deepcopy(controls)
+        """Process controls XML, applying substitutions.
+
+        Controls without any "$" marker or <skinshortcuts> element expand the
+        same way for every item, so they are processed once and copied.
+        """
+        key = id(controls)
+        if key not in self._static_controls:
+            static = not any(
+                node.tag == "skinshortcuts"
+                or "$" in (node.text or "")
+                or "$" in (node.tail or "")
+                or any("$" in value for value in node.attrib.values())
+                for node in controls.iter()
+            )
+            self._static_controls[key] = (
+                self._expand_controls(controls, context, item, menu) if static else None
+            )
+
+        processed = self._static_controls[key]
+        if processed is not None:
+            return clone_element(processed)
+        return self._expand_controls(
+            controls, context, item, menu, variable_map, output_suffix
+        )
+
+    def _expand_controls(
+        self,
+        controls: ET.Element,
+        context: dict[str, str],
+        item: MenuItem,
+        menu: Menu,
+        variable_map: dict[str, ET.Element] | None = None,
+        output_suffix: str = "",
+    ) -> ET.Element:
+        """Clone controls and apply substitutions for one item."""
+        result = clone_element(controls)
         self._process_element(result, context, item, menu, variable_map, output_suffix)
         self._remove_empty_elements(result)
 
         return result
 
     def _remove_empty_elements(self, elem: ET.Element) -> None:
-        """Remove leaf elements with no text content and no attributes."""
-        children_to_remove = []
-        for child in elem:
-            self._remove_empty_elements(child)
-            if len(child) == 0 and not child.text and not child.attrib:
-                children_to_remove.append(child)
-        for child in children_to_remove:
-            elem.remove(child)
+        """Remove leaf elements with no text content and no attributes.
+
+        Nodes are visited in reverse document order, so each element's
+        descendants are pruned before it is checked itself.
+        """
+        for node in reversed(list(elem.iter())):
+            if not len(node):
+                continue
+            kept = [child for child in node if len(child) or child.text or child.attrib]
+            if len(kept) != len(node):
+                node[:] = kept
 
     def _process_element(
         self,
@@ -1373,7 +1617,7 @@ class TemplateBuilder:
                     elem.attrib.pop("wrap", None)
                     return
 
-                include_def = self.schema.get_include(include_name)
+                include_def = self.schema.includes.get(include_name)
                 if include_def and include_def.controls is not None:
                     elem.set("_skinshortcuts_include", include_name)
                     wrap_attr = elem.get("wrap") or ""
@@ -1390,20 +1634,31 @@ class TemplateBuilder:
                 elem.attrib.pop("insert", None)
                 return
 
-        if elem.text:
-            elem.text = self._substitute_text(elem.text, context, item, menu)
-        if elem.tail:
-            elem.tail = self._substitute_text(elem.tail, context, item, menu)
-        for attr, value in list(elem.attrib.items()):
-            elem.set(attr, self._substitute_text(value, context, item, menu))
+        text = elem.text
+        if text and "$" in text:
+            elem.text = self._substitute_text(text, context, item, menu)
+        tail = elem.tail
+        if tail and "$" in tail:
+            elem.tail = self._substitute_text(tail, context, item, menu)
+        attrib = elem.attrib
+        if attrib and any("$" in value for value in attrib.values()):
+            for attr, value in attrib.items():
+                if "$" in value:
+                    attrib[attr] = self._substitute_text(value, context, item, menu)
 
         self._handle_include_substitution(elem)
 
-        children_to_remove = []
+        # Include, insert, onclick and remove markers are only ever set on
+        # <skinshortcuts> children, so other elements skip the marker passes
+        has_markers = False
         for child in elem:
+            if child.tag == "skinshortcuts":
+                has_markers = True
             self._process_element(child, context, item, menu, variable_map, output_suffix)
-            if child.get("_skinshortcuts_remove"):
-                children_to_remove.append(child)
+        if not has_markers:
+            return
+
+        children_to_remove = [child for child in elem if child.get("_skinshortcuts_remove")]
 
         self._handle_skinshortcuts_include(
             elem, context, item, menu, variable_map, output_suffix
@@ -1413,24 +1668,32 @@ class TemplateBuilder:
         )
         self._handle_skinshortcuts_onclick(elem, item, menu)
 
-        for child in children_to_remove:
-            elem.remove(child)
+        if children_to_remove:
+            remove_ids = {id(child) for child in children_to_remove}
+            elem[:] = [child for child in elem if id(child) not in remove_ids]
 
     def _handle_include_substitution(self, elem: ET.Element) -> None:
         """Convert $INCLUDE[...] in element text to <include> child elements.
 
         When element text contains $INCLUDE[name], converts it to a Kodi
-        <include>name</include> child element.
+        <include>name</include> child element. Every reference in the text is
+        converted, each keeping the text that follows it as its tail.
         """
-        if elem.text:
-            match = _INCLUDE_PATTERN.search(elem.text)
-            if match:
-                include_name = match.group(1)
-                include_elem = ET.Element("include")
-                include_elem.text = include_name
-                include_elem.tail = elem.text[match.end() :]
-                elem.text = elem.text[: match.start()]
-                elem.insert(0, include_elem)
+        text = elem.text
+        if not text or "$INCLUDE[" not in text:
+            return
+        matches = list(_INCLUDE_PATTERN.finditer(text))
+        if not matches:
+            return
+        includes = []
+        for i, match in enumerate(matches):
+            include_elem = ET.Element("include")
+            include_elem.text = match.group(1)
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            include_elem.tail = text[match.end() : end]
+            includes.append(include_elem)
+        elem.text = text[: matches[0].start()]
+        elem[0:0] = includes
 
     def _handle_skinshortcuts_include(
         self,
@@ -1449,38 +1712,43 @@ class TemplateBuilder:
         If wrap="true" was specified, outputs as a Kodi <include> element.
         Otherwise, unwraps and inserts the include's children directly.
         """
-        children_to_replace = []
-        for i, child in enumerate(elem):
-            include_name = child.get("_skinshortcuts_include")
-            if include_name:
-                wrap = child.get("_skinshortcuts_wrap") == "true"
-                children_to_replace.append((i, child, include_name, wrap))
+        markers = [child for child in elem if child.get("_skinshortcuts_include")]
+        if not markers:
+            return
 
-        for i, child, include_name, wrap in reversed(children_to_replace):
+        # Expand last-to-first: _process_controls merges variable groups into
+        # variable_map, so expansion order decides merged <value> order.
+        # The child list is then rebuilt once rather than shifted per insert.
+        replacements: dict[int, list[ET.Element]] = {}
+        for child in reversed(markers):
+            include_name = child.get("_skinshortcuts_include", "")
             include_def = self.schema.get_include(include_name)
-            if include_def and include_def.controls is not None:
-                expanded = self._process_controls(
-                    include_def.controls, context, item, menu, variable_map, output_suffix
-                )
-                if expanded is not None:
-                    tail = child.tail
-                    elem.remove(child)
+            if include_def is None or include_def.controls is None:
+                replacements[id(child)] = []
+                continue
+            expanded = self._process_controls(
+                include_def.controls, context, item, menu, variable_map, output_suffix
+            )
+            if expanded is None:
+                replacements[id(child)] = [child]
+                continue
 
-                    if wrap:
-                        include_elem = ET.Element("include")
-                        include_elem.set("name", include_name)
-                        for inc_child in list(expanded):
-                            include_elem.append(inc_child)
-                        include_elem.tail = tail
-                        elem.insert(i, include_elem)
-                    else:
-                        for j, inc_child in enumerate(list(expanded)):
-                            elem.insert(i + j, inc_child)
-                        if tail and len(expanded) > 0:
-                            last_child = elem[i + len(expanded) - 1]
-                            last_child.tail = (last_child.tail or "") + tail
+            tail = child.tail
+            if child.get("_skinshortcuts_wrap") == "true":
+                include_elem = ET.Element("include", {"name": include_name})
+                include_elem.extend(expanded)
+                include_elem.tail = tail
+                replacements[id(child)] = [include_elem]
             else:
-                elem.remove(child)
+                parts = list(expanded)
+                if tail and parts:
+                    parts[-1].tail = (parts[-1].tail or "") + tail
+                replacements[id(child)] = parts
+
+        new_children: list[ET.Element] = []
+        for child in elem:
+            new_children.extend(replacements.get(id(child), (child,)))
+        elem[:] = new_children
 
     def _handle_skinshortcuts_items(
         self,
@@ -1500,24 +1768,23 @@ class TemplateBuilder:
         $PROPERTY[...] within the items controls references submenu item properties.
         $PARENT[...] references parent menu item properties.
         """
-        children_to_replace: list[tuple[int, ET.Element, str]] = []
-        for i, child in enumerate(elem):
-            insert_name = child.get("_skinshortcuts_insert")
-            if insert_name:
-                children_to_replace.append((i, child, insert_name))
+        children_to_replace = [
+            (i, child) for i, child in enumerate(elem) if child.get("_skinshortcuts_insert")
+        ]
 
-        for i, child, insert_name in reversed(children_to_replace):
-            items_def = self.schema.get_items_template(insert_name)
+        for i, child in reversed(children_to_replace):
+            insert_name = child.get("_skinshortcuts_insert")
+            items_def = self.schema.items_templates.get(insert_name)
             if not items_def:
                 log.debug(f"Items definition '{insert_name}' not found")
                 notify("Items Template Error", f"'{insert_name}' not defined")
-                elem.remove(child)
+                del elem[i]
                 continue
 
             if items_def.condition and not self._eval_condition(
                 items_def.condition, item, context
             ):
-                elem.remove(child)
+                del elem[i]
                 continue
 
             source = items_def.get_source()
@@ -1526,15 +1793,15 @@ class TemplateBuilder:
 
             if not submenu:
                 log.debug(f"Submenu '{submenu_id}' not found for items iteration")
-                elem.remove(child)
+                del elem[i]
                 continue
             if not submenu.items:
                 log.debug(f"Submenu '{submenu_id}' has no items")
-                elem.remove(child)
+                del elem[i]
                 continue
 
             if items_def.controls is None:
-                elem.remove(child)
+                del elem[i]
                 continue
 
             output_elems = list(items_def.controls)
@@ -1569,16 +1836,14 @@ class TemplateBuilder:
                         )
 
                 for out_elem in output_elems:
-                    cloned = copy.deepcopy(out_elem)
+                    cloned = clone_element(out_elem)
                     self._process_items_element(
                         cloned, sub_context, context, sub_item, item
                     )
                     expanded_controls.append(cloned)
 
             tail = child.tail
-            elem.remove(child)
-            for j, ctrl in enumerate(expanded_controls):
-                elem.insert(i + j, ctrl)
+            elem[i : i + 1] = expanded_controls
             if tail and expanded_controls:
                 last = expanded_controls[-1]
                 last.tail = (last.tail or "") + tail
@@ -1597,31 +1862,32 @@ class TemplateBuilder:
         Actions are ordered: before defaults -> conditional -> unconditional -> after defaults.
         Each onclick element preserves its condition attribute if present.
         """
-        children_to_replace: list[tuple[int, ET.Element]] = []
-        for i, child in enumerate(elem):
-            if child.get("_skinshortcuts_onclick"):
-                children_to_replace.append((i, child))
-
-        for i, child in reversed(children_to_replace):
-            before_actions = [a for a in menu.defaults.actions if a.when == "before"]
-            after_actions = [a for a in menu.defaults.actions if a.when == "after"]
-            conditional = [a for a in item.actions if a.condition]
-            unconditional = [a for a in item.actions if not a.condition]
+        children_to_replace = [
+            (i, child) for i, child in enumerate(elem) if child.get("_skinshortcuts_onclick")
+        ]
+        if not children_to_replace:
+            return
 
-            all_actions = before_actions + conditional + unconditional + after_actions
+        before_actions = [a for a in menu.defaults.actions if a.when == "before"]
+        after_actions = [a for a in menu.defaults.actions if a.when == "after"]
+        conditional = [a for a in item.actions if a.condition]
+        unconditional = [a for a in item.actions if not a.condition]
+        all_actions = before_actions + conditional + unconditional + after_actions
 
+        for i, child in reversed(children_to_replace):
             tail = child.tail
-            elem.remove(child)
 
-            for j, act in enumerate(all_actions):
-                onclick = ET.Element("onclick")
+            onclicks = []
+            for act in all_actions:
+                onclick = ET.Element(
+                    "onclick", {"condition": act.condition} if act.condition else {}
+                )
                 onclick.text = act.action
-                if act.condition:
-                    onclick.set("condition", act.condition)
-                elem.insert(i + j, onclick)
+                onclicks.append(onclick)
+            elem[i : i + 1] = onclicks
 
-            if tail and all_actions:
-                last_onclick = elem[i + len(all_actions) - 1]
+            if tail and onclicks:
+                last_onclick = onclicks[-1]
                 last_onclick.tail = (last_onclick.tail or "") + tail
 
     def _apply_items_transformations_from_definition(
@@ -1659,7 +1925,7 @@ class TemplateBuilder:
         for ref in items_def.property_groups:
             if ref.condition and not self._eval_condition(ref.condition, sub_item, sub_context):
                 continue
-            group = self.schema.get_property_group(ref.name)
+            group = self.schema.property_groups.get(ref.name)
             if group:
                 self._apply_property_group(group, sub_item, sub_context, "")
 
@@ -1674,7 +1940,7 @@ class TemplateBuilder:
         Context contains submenu item properties plus built-ins.
         Parent properties are accessed via $PARENT[...], not included in context.
         """
-        context: dict[str, str] = {**submenu.defaults.properties, **sub_item.properties}
+        context = self._base_context(sub_item, submenu)
         context["index"] = str(sub_idx)
         context["name"] = sub_item.name
         context["menu"] = submenu.name
@@ -1703,24 +1969,26 @@ class TemplateBuilder:
         $PROPERTY[...] -> submenu item properties (sub_context)
         $PARENT[...] -> parent item properties (parent_context)
         """
-        if elem.text:
+        text = elem.text
+        if text and "$" in text:
             elem.text = self._substitute_text(
-                elem.text, sub_context, sub_item,
+                text, sub_context, sub_item,
                 parent_context=parent_context, parent_item=parent_item
             )
-        if elem.tail:
+        tail = elem.tail
+        if tail and "$" in tail:
             elem.tail = self._substitute_text(
-                elem.tail, sub_context, sub_item,
+                tail, sub_context, sub_item,
                 parent_context=parent_context, parent_item=parent_item
             )
-        for attr, value in list(elem.attrib.items()):
-            elem.set(
-                attr,
-                self._substitute_text(
-                    value, sub_context, sub_item,
-                    parent_context=parent_context, parent_item=parent_item
-                ),
-            )
+        attrib = elem.attrib
+        if attrib and any("$" in value for value in attrib.values()):
+            for attr, value in attrib.items():
+                if "$" in value:
+                    attrib[attr] = self._substitute_text(
+                        value, sub_context, sub_item,
+                        parent_context=parent_context, parent_item=parent_item
+                    )
 
         self._handle_include_substitution(elem)
 
@@ -1755,70 +2023,65 @@ class TemplateBuilder:
             parent_context: Optional parent context for $PARENT substitution
             parent_item: Optional parent item for $PARENT substitution
         """
+        # Every marker starts with "$"; most text has none
+        if "$" not in text:
+            return text
+
         if "$EXP[" in text:
             text = self._expand_expressions(text)
             text = self._strip_nosuffix_markers(text)
 
-        if parent_item is not None:
+        if parent_item is not None and "$PARENT[" in text:
+            text = _substitute_parent(text, parent_context, parent_item)
 
-            def replace_parent(match: re.Match) -> str:
-                prop_name = match.group(1)
-                if parent_context and prop_name in parent_context:
-                    return parent_context[prop_name]
-                if prop_name == "label":
-                    return parent_item.label
-                if prop_name == "name":
-                    return parent_item.name
-                if prop_name in parent_item.properties:
-                    return parent_item.properties[prop_name]
-                return ""
-
-            text = _PARENT_PATTERN.sub(replace_parent, text)
-
-        def replace_property(match: re.Match) -> str:
-            name = match.group(1)
-            if name in context:
-                return context[name]
-            if name in item.properties:
-                return item.properties[name]
-            return ""
-
-        text = _PROPERTY_PATTERN.sub(replace_property, text)
+        if "$PROPERTY[" in text:
+            text = _substitute_properties(text, context, item.properties)
 
-        properties = {**item.properties, **context}
-        if parent_context:
-            properties = {**parent_context, **properties}
-        if parent_item:
-            properties = {**parent_item.properties, **properties}
+        if "$MATH[" in text or "$IF[" in text:
+            # Lookup-only view, highest precedence first; avoids merging dicts
+            properties = ChainMap(context, item.properties)
+            if parent_context:
+                properties.maps.append(parent_context)
+            if parent_item:
+                properties.maps.append(parent_item.properties)
 
-        if "$MATH[" in text:
-            text = process_math_expressions(text, properties)
+            if "$MATH[" in text:
+                text = process_math_expressions(text, properties)
 
-        if "$IF[" in text:
-            text = process_if_expressions(text, properties)
+            if "$IF[" in text:
+                text = process_if_expressions(text, properties)
 
         return text
 
     def write(self, path: str, indent: bool = True) -> None:
-        """Write template includes to file."""
+        """Write template includes to file.
+
+        Top-level elements are serialized one at a time and released as they
+        are written, so the built tree and its serialized text are not both
+        held in full. Output matches ElementTree.write with an XML declaration.
+        """
         root = self.build()
-        if indent:
-            _indent_xml(root)
-        tree = ET.ElementTree(root)
-        tree.write(path, encoding="UTF-8", xml_declaration=True)
-
-
-def _indent_xml(elem: ET.Element, level: int = 0) -> None:
-    """Add indentation to XML tree."""
-    indent = "\n" + "\t" * level
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = indent + "\t"
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = indent
-        for child in elem:
-            _indent_xml(child, level + 1)
-        if not child.tail or not child.tail.strip():
-            child.tail = indent
-    elif level and (not elem.tail or not elem.tail.strip()):
-        elem.tail = indent
+        with open(
+            path,
+            "w",
+            buffering=_WRITE_BUFFER_SIZE,
+            encoding="UTF-8",
+            errors="xmlcharrefreplace",
+        ) as f:
+            f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+            if not len(root):
+                f.write("<includes />")
+                return
+            pending = list(root)
+            del root[:]
+            pending.reverse()
+            f.write("<includes>\n\t" if indent else "<includes>")
+            while pending:
+                elem = pending.pop()
+                if indent:
+                    indent_xml(elem, 1)
+                    if not elem.tail or not elem.tail.strip():
+                        elem.tail = "\n\t" if pending else "\n"
+                ET.ElementTree(elem).write(f, encoding="unicode")
+                elem.clear()
+            f.write("</includes>\n" if indent else "</includes>")
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import re
 import xml.etree.ElementTree as ET
+from functools import lru_cache
 from typing import TYPE_CHECKING
 
 from ..log import get_logger
@@ -14,6 +15,10 @@ if TYPE_CHECKING:
 
 log = get_logger("ViewBuilder")
 
+_UNSAFE_NAME_PATTERN = re.compile(r"[^a-zA-Z0-9_]")
+_IS_LIBRARY = "String.IsEmpty(Container.PluginName)"
+_IS_PLUGIN = "!String.IsEmpty(Container.PluginName)"
+
 
 class ViewExpressionBuilder:
     """Builds Kodi visibility expressions for view locking.
@@ -29,7 +34,8 @@ class ViewExpressionBuilder:
         self.config = config
         self.userdata = userdata
         self.prefix = config.prefix
-        self._view_conditions: dict[str, list[str]] = {}
+        # Per-view clauses in first-seen order; dict keys drop repeats
+        self._view_conditions: dict[str, dict[str, None]] = {}
         self._content_has_overrides: set[str] = set()
 
     def build(self) -> list[ET.Element]:
@@ -38,17 +44,17 @@ class ViewExpressionBuilder:
             return []
 
         expressions: list[ET.Element] = []
-        self._view_conditions = {v.id: [] for v in self.config.views}
+        self._view_conditions = {v.id: {} for v in self.config.views}
         self._content_has_overrides.clear()
 
         for content in self.config.content_rules:
+            content_name = _sanitize_name(content.name)
             plugin_overrides = self._get_effective_plugin_overrides(content)
             if plugin_overrides:
-                content_name = _sanitize_name(content.name)
                 self._content_has_overrides.add(content_name)
                 expressions.extend(self._build_plugin_helpers(content_name, plugin_overrides))
 
-            self._collect_view_conditions(content, plugin_overrides)
+            self._collect_view_conditions(content, content_name, plugin_overrides)
 
         for view in self.config.views:
             expressions.append(self._build_view_expression(view.id))
@@ -63,77 +69,65 @@ class ViewExpressionBuilder:
     ) -> list[ET.Element]:
         """Build plugin override helper expressions."""
         expressions: list[ET.Element] = []
+        has_override = f"{self.prefix}{content_name}_HasPluginOverride"
 
-        elem = ET.Element("expression")
-        elem.set("name", f"{self.prefix}{content_name}_HasPluginOverride")
-        conditions = [
-            f"String.IsEqual(Container.PluginName,{plugin_id})"
-            for plugin_id in sorted(overrides.keys())
-        ]
-        elem.text = " | ".join(conditions)
+        elem = ET.Element("expression", {"name": has_override})
+        elem.text = " | ".join(
+            [f"String.IsEqual(Container.PluginName,{plugin_id})" for plugin_id in sorted(overrides)]
+        )
         expressions.append(elem)
 
-        elem = ET.Element("expression")
-        elem.set("name", f"{self.prefix}{content_name}_IsGenericPlugin")
-        elem.text = (
-            f"!String.IsEmpty(Container.PluginName) + "
-            f"!$EXP[{self.prefix}{content_name}_HasPluginOverride]"
-        )
+        elem = ET.Element("expression", {"name": f"{self.prefix}{content_name}_IsGenericPlugin"})
+        elem.text = f"{_IS_PLUGIN} + !$EXP[{has_override}]"
         expressions.append(elem)
 
         return expressions
 
     def _collect_view_conditions(
-        self, content: ViewContent, plugin_overrides: dict[str, str]
+        self, content: ViewContent, content_name: str, plugin_overrides: dict[str, str]
     ) -> None:
         """Collect visibility conditions for each view from this content type."""
-        content_name = _sanitize_name(content.name)
         visible = content.visible
+        view_conditions = self._view_conditions
+        # Every clause for this content starts with its visible condition
+        clause_start = f"[{visible} + "
 
         library_view = self._get_effective_library_view(content)
         generic_plugin_view = self._get_effective_generic_plugin_view(content)
+        # Same view for both, no overrides - the content visible alone selects it
+        shared = library_view == generic_plugin_view and not plugin_overrides
 
-        if library_view in self._view_conditions:
-            if library_view == generic_plugin_view and not plugin_overrides:
-                # Same view for both, no overrides - just use content visible
-                self._view_conditions[library_view].append(f"[{visible}]")
+        if library_view in view_conditions:
+            if shared:
+                view_conditions[library_view][f"[{visible}]"] = None
             else:
                 # Different views or has overrides - need source check
-                self._view_conditions[library_view].append(
-                    f"[{visible} + String.IsEmpty(Container.PluginName)]"
-                )
-
-        if generic_plugin_view in self._view_conditions:
-            if library_view == generic_plugin_view and not plugin_overrides:
-                pass  # Already added above
-            elif plugin_overrides:
-                self._view_conditions[generic_plugin_view].append(
-                    f"[{visible} + $EXP[{self.prefix}{content_name}_IsGenericPlugin]]"
-                )
+                view_conditions[library_view][f"{clause_start}{_IS_LIBRARY}]"] = None
+
+        if generic_plugin_view in view_conditions and not shared:
+            if plugin_overrides:
+                is_generic = f"$EXP[{self.prefix}{content_name}_IsGenericPlugin]"
+                view_conditions[generic_plugin_view][f"{clause_start}{is_generic}]"] = None
             else:
-                self._view_conditions[generic_plugin_view].append(
-                    f"[{visible} + !String.IsEmpty(Container.PluginName)]"
-                )
+                view_conditions[generic_plugin_view][f"{clause_start}{_IS_PLUGIN}]"] = None
 
         for plugin_id, view_id in plugin_overrides.items():
-            if view_id in self._view_conditions:
-                self._view_conditions[view_id].append(
-                    f"[{visible} + String.IsEqual(Container.PluginName,{plugin_id})]"
-                )
+            if view_id in view_conditions:
+                view_conditions[view_id][
+                    f"{clause_start}String.IsEqual(Container.PluginName,{plugin_id})]"
+                ] = None
 
     def _build_view_expression(self, view_id: str) -> ET.Element:
         """Build the combined visibility expression for a view."""
-        elem = ET.Element("expression")
-        elem.set("name", f"{self.prefix}{view_id}")
+        elem = ET.Element("expression", {"name": f"{self.prefix}{view_id}"})
 
-        conditions = self._view_conditions.get(view_id, [])
+        conditions = self._view_conditions.get(view_id, {})
         elem.text = " | ".join(conditions) if conditions else "False"
         return elem
 
     def _build_include_expression(self, view_id: str) -> ET.Element:
         """Build the _Include expression for conditional view loading."""
-        elem = ET.Element("expression")
-        elem.set("name", f"{self.prefix}{view_id}_Include")
+        elem = ET.Element("expression", {"name": f"{self.prefix}{view_id}_Include"})
         has_conditions = bool(self._view_conditions.get(view_id))
         elem.text = "True" if has_conditions else "False"
         return elem
@@ -162,9 +156,10 @@ class ViewExpressionBuilder:
         return overrides
 
 
+@lru_cache(maxsize=256)
 def _sanitize_name(name: str) -> str:
     """Sanitize a content name for use in expression names."""
     if not name:
         return name
-    sanitized = re.sub(r"[^a-zA-Z0-9_]", "_", name)
+    sanitized = _UNSAFE_NAME_PATTERN.sub("_", name)
     return sanitized[0].upper() + sanitized[1:]
@@ -27,8 +27,14 @@ Negation Precedence:
 from __future__ import annotations
 
 import re
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
 
 _OR_SPLIT_PATTERN = re.compile(r"\s*\|\s*")
+_BRACKET_PATTERN = re.compile(r"[\[\]]")
 _CONDITION_MATCH_PATTERN = re.compile(r"^(!?)([a-zA-Z_][a-zA-Z0-9_\.]*)(=|~)(.*)$")
 
 # Keyword to symbol mappings (applied with word boundaries)
@@ -91,30 +97,43 @@ def expand_compact_or(condition: str) -> str:
 
 
 def _split_preserving_brackets(text: str, delimiter: str) -> list[str]:
-    """Split text by delimiter but preserve content inside brackets."""
+    """Split text by delimiter but preserve content inside brackets.
+
+    Only brackets and delimiters are visited; the text between them is
+    sliced rather than rebuilt character by character.
+    """
+    if "[" not in text and "]" not in text:
+        parts = text.split(delimiter)
+        if not parts[-1]:
+            parts.pop()
+        return parts
+
     parts = []
-    current = []
     depth = 0
+    start = 0
 
-    for char in text:
+    for match in _split_token_pattern(delimiter).finditer(text):
+        char = match.group()
         if char == "[":
             depth += 1
-            current.append(char)
         elif char == "]":
             depth -= 1
-            current.append(char)
-        elif char == delimiter and depth == 0:
-            parts.append("".join(current))
-            current = []
-        else:
-            current.append(char)
+        elif depth == 0:
+            parts.append(text[start : match.start()])
+            start = match.end()
 
-    if current:
-        parts.append("".join(current))
+    if start < len(text):
+        parts.append(text[start:])
 
     return parts
 
 
+@lru_cache(maxsize=8)
+def _split_token_pattern(delimiter: str) -> re.Pattern[str]:
+    """Pattern matching brackets and the delimiter."""
+    return re.compile(f"[\\[\\]{re.escape(delimiter)}]")
+
+
 def _expand_or_segment(segment: str) -> str:
     """Expand a single OR segment."""
     parts = _OR_SPLIT_PATTERN.split(segment)
@@ -145,7 +164,7 @@ def _expand_or_segment(segment: str) -> str:
     return " | ".join(result_parts)
 
 
-def evaluate_condition(condition: str, properties: dict[str, str]) -> bool:
+def evaluate_condition(condition: str, properties: Mapping[str, str]) -> bool:
     """Evaluate a condition against property values.
 
     Args:
@@ -159,16 +178,80 @@ def evaluate_condition(condition: str, properties: dict[str, str]) -> bool:
     if not condition:
         return True
 
-    condition = condition.strip()
+    prepared = _prepare_condition(condition)
+    if not prepared:
+        return True
+
+    names = referenced_properties(condition)
+    return _evaluate_read_values(prepared, names, tuple([properties.get(name) for name in names]))
+
+
+def evaluate_condition_uncached(condition: str, properties: Mapping[str, str]) -> bool:
+    """Evaluate a condition without the shared result cache.
+
+    For callers that already memoize results on the values a condition
+    reads (TemplateBuilder), so each result is stored only once.
+    """
     if not condition:
         return True
 
+    prepared = _prepare_condition(condition)
+    if not prepared:
+        return True
+    return _evaluate_node(_compile_condition(prepared), properties)
+
+
+@lru_cache(maxsize=4096)
+def _evaluate_read_values(
+    condition: str, names: tuple[str, ...], values: tuple[str | None, ...]
+) -> bool:
+    """Evaluate a prepared condition against only the values it reads.
+
+    The key stays small however many properties the caller holds, and
+    siblings that agree on those values share one evaluation.
+    """
+    properties = {name: value for name, value in zip(names, values) if value is not None}
+    return _evaluate_node(_compile_condition(condition), properties)
+
+
+@lru_cache(maxsize=4096)
+def _prepare_condition(condition: str) -> str:
+    """Normalize keywords and expand compact OR syntax.
+
+    The result depends only on the condition string, so it is cached and
+    shared across every item the condition is evaluated against.
+    """
+    condition = condition.strip()
+    if not condition:
+        return condition
+
     # Convert keywords to symbols (AND->+, OR->|, etc.)
     condition = _normalize_keywords(condition)
 
     if "|" in condition:
         condition = expand_compact_or(condition)
-    return _evaluate_expanded(condition, properties)
+    return condition
+
+
+@lru_cache(maxsize=4096)
+def referenced_properties(condition: str) -> tuple[str, ...]:
+    """Return the property names a condition reads, sorted.
+
+    Names are collected from the compiled node tree, so the set is exact,
+    including the empty name a bare negation reads.
+    """
+    names: set[str] = set()
+    stack = [_compile_condition(_prepare_condition(condition))]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind in ("and", "or"):
+            stack.extend(node[1])
+        elif kind == "not":
+            stack.append(node[1])
+        elif kind != "const":
+            names.add(node[1])
+    return tuple(sorted(names))
 
 
 def _is_wrapped_in_brackets(text: str) -> bool:
@@ -176,45 +259,58 @@ def _is_wrapped_in_brackets(text: str) -> bool:
     if not text.startswith("[") or not text.endswith("]"):
         return False
     depth = 0
-    for i, char in enumerate(text):
-        if char == "[":
+    last = len(text) - 1
+    for match in _BRACKET_PATTERN.finditer(text):
+        if match.group() == "[":
             depth += 1
-        elif char == "]":
+        else:
             depth -= 1
-            if depth == 0 and i < len(text) - 1:
+            if depth == 0 and match.start() < last:
                 return False
     return depth == 0
 
 
-def _evaluate_expanded(condition: str, properties: dict[str, str]) -> bool:
-    """Evaluate an expanded condition."""
+# Compiled condition nodes are tuples tagged by their first element:
+#   ("and", children)  ("or", children)  ("not", child)  ("const", bool)
+#   ("empty", name)  ("in", name, values)  ("eq", name, value, literal)
+#   ("contains", name, value)  ("truthy", name)
+_TRUE_NODE = ("const", True)
+
+
+@lru_cache(maxsize=4096)
+def _compile_condition(condition: str) -> tuple:
+    """Parse a prepared condition into a node tree.
+
+    Bracket matching and splitting happen once per distinct condition;
+    evaluation then only walks the tree.
+    """
     condition = condition.strip()
     if not condition:
-        return True
+        return _TRUE_NODE
 
     if _is_wrapped_in_brackets(condition):
-        return _evaluate_expanded(condition[1:-1], properties)
+        return _compile_condition(condition[1:-1])
 
     # Split AND/OR before negation: !a + b = (!a) + b, not !(a + b)
     and_parts = _split_preserving_brackets(condition, "+")
     if len(and_parts) > 1:
-        return all(_evaluate_expanded(part.strip(), properties) for part in and_parts)
+        return ("and", tuple([_compile_condition(part.strip()) for part in and_parts]))
 
     or_parts = _split_preserving_brackets(condition, "|")
     if len(or_parts) > 1:
-        return any(_evaluate_expanded(part.strip(), properties) for part in or_parts)
+        return ("or", tuple([_compile_condition(part.strip()) for part in or_parts]))
 
     if condition.startswith("!"):
         inner = condition[1:].strip()
         if _is_wrapped_in_brackets(inner):
-            return not _evaluate_expanded(inner[1:-1], properties)
-        return not _evaluate_single(inner, properties)
+            return ("not", _compile_condition(inner[1:-1]))
+        return ("not", _compile_single(inner))
 
-    return _evaluate_single(condition, properties)
+    return _compile_single(condition)
 
 
-def _evaluate_single(condition: str, properties: dict[str, str]) -> bool:
-    """Evaluate a single condition (property=value or property~value)."""
+def _compile_single(condition: str) -> tuple:
+    """Compile a single condition (property=value or property~value)."""
     condition = condition.strip()
 
     negated = False
@@ -223,58 +319,64 @@ def _evaluate_single(condition: str, properties: dict[str, str]) -> bool:
         condition = condition[1:].strip()
 
     if _is_wrapped_in_brackets(condition):
-        result = _evaluate_expanded(condition[1:-1], properties)
-        return not result if negated else result
-
+        node = _compile_condition(condition[1:-1])
     # EMPTY operator: propertyName EMPTY
-    if condition.endswith(" EMPTY"):
-        prop_name = condition[:-6].strip()
-        actual = properties.get(prop_name, "")
-        result = actual == ""
-        return not result if negated else result
-
+    elif condition.endswith(" EMPTY"):
+        node = ("empty", condition[:-6].strip())
     # IN operator: propertyName IN value1,value2,value3
-    if " IN " in condition:
+    elif " IN " in condition:
         prop_name, values_str = condition.split(" IN ", 1)
-        prop_name = prop_name.strip()
-        values_str = values_str.strip()
-        actual = properties.get(prop_name, "")
-        values = [v.strip() for v in values_str.split(",")]
-        result = actual in values
-        return not result if negated else result
-
-    if "=" in condition:
+        values = tuple([v.strip() for v in values_str.strip().split(",")])
+        node = ("in", prop_name.strip(), values)
+    elif "=" in condition:
         prop_name, value = condition.split("=", 1)
         prop_name = prop_name.strip()
-        value = value.strip()
-        # Check if left side is a property name or a literal value
-        if prop_name in properties:
-            actual = properties[prop_name]
-        elif prop_name.lower() in ("true", "false"):
-            # Literal boolean comparison (e.g., from $IF after $PROPERTY substitution)
-            actual = prop_name
-        else:
-            actual = ""
-        result = actual == value
-        return not result if negated else result
-
-    if "~" in condition:
+        # Literal boolean comparison (e.g., from $IF after $PROPERTY substitution)
+        literal = prop_name if prop_name.lower() in ("true", "false") else ""
+        node = ("eq", prop_name, value.strip(), literal)
+    elif "~" in condition:
         prop_name, value = condition.split("~", 1)
-        prop_name = prop_name.strip()
-        value = value.strip()
-        actual = properties.get(prop_name, "")
-        result = value in actual
-        return not result if negated else result
-
+        node = ("contains", prop_name.strip(), value.strip())
     # Literal boolean value (e.g., from $PROPERTY substitution)
-    if condition.lower() in ("true", "false"):
-        result = condition.lower() == "true"
-        return not result if negated else result
-
+    elif condition.lower() in ("true", "false"):
+        node = ("const", condition.lower() == "true")
     # Property name only: truthy if non-empty (but "false" string is falsy)
-    val = properties.get(condition, "")
-    if val.lower() in ("true", "false"):
-        result = val.lower() == "true"
     else:
-        result = bool(val)
-    return not result if negated else result
+        node = ("truthy", condition)
+
+    return ("not", node) if negated else node
+
+
+def _evaluate_node(node: tuple, properties: Mapping[str, str]) -> bool:
+    """Evaluate a compiled condition node against property values."""
+    kind = node[0]
+    if kind == "eq":
+        # Left side is a property name, else a literal boolean, else empty
+        prop_name = node[1]
+        actual = properties[prop_name] if prop_name in properties else node[3]
+        return actual == node[2]
+    # Plain loops short-circuit without creating a generator per node
+    if kind == "and":
+        for child in node[1]:
+            if not _evaluate_node(child, properties):
+                return False
+        return True
+    if kind == "or":
+        for child in node[1]:
+            if _evaluate_node(child, properties):
+                return True
+        return False
+    if kind == "not":
+        return not _evaluate_node(node[1], properties)
+    if kind == "truthy":
+        val = properties.get(node[1], "")
+        if val.lower() in ("true", "false"):
+            return val.lower() == "true"
+        return bool(val)
+    if kind == "contains":
+        return node[2] in properties.get(node[1], "")
+    if kind == "empty":
+        return properties.get(node[1], "") == ""
+    if kind == "in":
+        return properties.get(node[1], "") in node[2]
+    return node[1]
@@ -6,7 +6,6 @@ import copy
 from dataclasses import dataclass, field
 from pathlib import Path
 
-from .builders import IncludesBuilder
 from .loaders import (
     load_backgrounds,
     load_menus,
@@ -269,6 +268,8 @@ class SkinConfig:
         for menu in menus:
             self.resolve_item_properties(menu)
 
+        from .builders.includes import IncludesBuilder
+
         builder = IncludesBuilder(
             menus=menus,
             templates=self.templates,
@@ -9,7 +9,8 @@ composed of several mixins for separation of concerns:
 - PropertiesMixin: Property management (widget, background, toggle, options)
 - SubdialogsMixin: Subdialog management (submenu editing, onclose handling)
 
-Public API:
+Public API (imported on first access, so importing a submodule such as
+dialog.views does not load every mixin):
 - ManagementDialog: The complete dialog class
 - show_management_dialog(): Convenience function to show the dialog
 - get_shortcuts_path(): Get the current skin's shortcuts folder path
@@ -17,92 +18,29 @@ Public API:
 
 from __future__ import annotations
 
-try:
-    import xbmcvfs
-
-    IN_KODI = True
-except ImportError:
-    IN_KODI = False
-
-from .base import (
-    ACTION_CANCEL,
-    ACTION_CONTEXT,
-    CONTROL_ADD,
-    CONTROL_CHOOSE_SHORTCUT,
-    CONTROL_DELETE,
-    CONTROL_EDIT_SUBMENU,
-    CONTROL_LIST,
-    CONTROL_MOVE_DOWN,
-    CONTROL_MOVE_UP,
-    CONTROL_RESET_ITEM,
-    CONTROL_RESTORE_DELETED,
-    CONTROL_SET_ACTION,
-    CONTROL_SET_ICON,
-    CONTROL_SET_LABEL,
-    CONTROL_TOGGLE_DISABLED,
-    DialogBaseMixin,
-    get_shortcuts_path,
-)
-from .items import ItemsMixin
-from .pickers import PickersMixin
-from .properties import PropertiesMixin
-from .subdialogs import SubdialogsMixin
-
-
-class ManagementDialog(
-    SubdialogsMixin,
-    PropertiesMixin,
-    PickersMixin,
-    ItemsMixin,
-    DialogBaseMixin,
-):
-    """Dialog for managing menu shortcuts.
-
-    Composes multiple mixins to provide full functionality:
-    - DialogBaseMixin: Core initialization, list management, event routing
-    - ItemsMixin: Item operations (add, delete, move, label, icon, action)
-    - PickersMixin: Shortcut and widget picker dialogs
-    - PropertiesMixin: Property management (widget, background, toggle, options)
-    - SubdialogsMixin: Subdialog management (submenu editing, onclose handling)
-
-    DialogBaseMixin inherits from xbmcgui.WindowXMLDialog, providing the base.
-    """
-
-
-def show_management_dialog(
-    menu_id: str = "mainmenu",
-    shortcuts_path: str | None = None,
-) -> bool:
-    """Show the management dialog.
-
-    Args:
-        menu_id: ID of menu to manage
-        shortcuts_path: Path to shortcuts folder (auto-detected if None)
-
-    Returns:
-        True if changes were saved, False otherwise
-    """
-    if not IN_KODI:
-        return False
-
-    if shortcuts_path is None:
-        shortcuts_path = get_shortcuts_path()
-
-    skin_path = xbmcvfs.translatePath("special://skin/")
-    dialog_xml = "script-skinshortcuts.xml"
-
-    dialog = ManagementDialog(
-        dialog_xml,
-        skin_path,
-        "Default",
-        menu_id=menu_id,
-        shortcuts_path=shortcuts_path,
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .base import (
+        ACTION_CANCEL,
+        ACTION_CONTEXT,
+        CONTROL_ADD,
+        CONTROL_CHOOSE_SHORTCUT,
+        CONTROL_DELETE,
+        CONTROL_EDIT_SUBMENU,
+        CONTROL_LIST,
+        CONTROL_MOVE_DOWN,
+        CONTROL_MOVE_UP,
+        CONTROL_RESET_ITEM,
+        CONTROL_RESTORE_DELETED,
+        CONTROL_SET_ACTION,
+        CONTROL_SET_ICON,
+        CONTROL_SET_LABEL,
+        CONTROL_TOGGLE_DISABLED,
+        get_shortcuts_path,
     )
-    dialog.doModal()
-    changes_saved = dialog.changes_saved
-    del dialog
-    return changes_saved
-
+    from .management import ManagementDialog, show_management_dialog
 
 __all__ = [
     "ManagementDialog",
@@ -124,3 +62,34 @@ __all__ = [
     "ACTION_CANCEL",
     "ACTION_CONTEXT",
 ]
+
+# Imported on first access (PEP 562)
+_LAZY_IMPORTS = {
+    "ManagementDialog": ".management",
+    "show_management_dialog": ".management",
+    "get_shortcuts_path": ".base",
+    "CONTROL_LIST": ".base",
+    "CONTROL_ADD": ".base",
+    "CONTROL_DELETE": ".base",
+    "CONTROL_MOVE_UP": ".base",
+    "CONTROL_MOVE_DOWN": ".base",
+    "CONTROL_SET_LABEL": ".base",
+    "CONTROL_SET_ICON": ".base",
+    "CONTROL_SET_ACTION": ".base",
+    "CONTROL_RESTORE_DELETED": ".base",
+    "CONTROL_RESET_ITEM": ".base",
+    "CONTROL_TOGGLE_DISABLED": ".base",
+    "CONTROL_CHOOSE_SHORTCUT": ".base",
+    "CONTROL_EDIT_SUBMENU": ".base",
+    "ACTION_CANCEL": ".base",
+    "ACTION_CONTEXT": ".base",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,71 @@
+"""ManagementDialog composition and the show_management_dialog() entry point."""
+
+from __future__ import annotations
+
+try:
+    import xbmcvfs
+
+    IN_KODI = True
+except ImportError:
+    IN_KODI = False
+
+from .base import DialogBaseMixin, get_shortcuts_path
+from .items import ItemsMixin
+from .pickers import PickersMixin
+from .properties import PropertiesMixin
+from .subdialogs import SubdialogsMixin
+
+
+class ManagementDialog(
+    SubdialogsMixin,
+    PropertiesMixin,
+    PickersMixin,
+    ItemsMixin,
+    DialogBaseMixin,
+):
+    """Dialog for managing menu shortcuts.
+
+    Composes multiple mixins to provide full functionality:
+    - DialogBaseMixin: Core initialization, list management, event routing
+    - ItemsMixin: Item operations (add, delete, move, label, icon, action)
+    - PickersMixin: Shortcut and widget picker dialogs
+    - PropertiesMixin: Property management (widget, background, toggle, options)
+    - SubdialogsMixin: Subdialog management (submenu editing, onclose handling)
+
+    DialogBaseMixin inherits from xbmcgui.WindowXMLDialog, providing the base.
+    """
+
+
+def show_management_dialog(
+    menu_id: str = "mainmenu",
+    shortcuts_path: str | None = None,
+) -> bool:
+    """Show the management dialog.
+
+    Args:
+        menu_id: ID of menu to manage
+        shortcuts_path: Path to shortcuts folder (auto-detected if None)
+
+    Returns:
+        True if changes were saved, False otherwise
+    """
+    if not IN_KODI:
+        return False
+
+    if shortcuts_path is None:
+        shortcuts_path = get_shortcuts_path()
+
+    skin_path = xbmcvfs.translatePath("special://skin/")
+    dialog_xml = "script-skinshortcuts.xml"
+
+    dialog = ManagementDialog(
+        dialog_xml,
+        skin_path,
+        "Default",
+        menu_id=menu_id,
+        shortcuts_path=shortcuts_path,
+    )
+    dialog.doModal()
+    changes_saved = dialog.changes_saved
+    del dialog
+    return changes_saved
@@ -50,7 +50,7 @@ class PickerGroup(Protocol):
     items: list
 
 
-from ..constants import ADDONS_SOURCE_MAP, WINDOW_MAP, extract_path_from_action
+from ..constants import ADDONS_SOURCE_MAP, TARGET_MAP, WINDOW_MAP, extract_path_from_action
 from ..loaders import evaluate_condition, load_groupings
 from ..localize import LANGUAGE, resolve_label
 from ..playlists import (
@@ -580,8 +580,6 @@ class PickersMixin:
 
     def _map_target_to_window(self, target: str) -> str:
         """Map content target to widget target window."""
-        from ..constants import TARGET_MAP
-
         return TARGET_MAP.get(target.lower(), "videos") if target else "videos"
 
     def _pick_widget_type(self, addon_type: str) -> str | None:
@@ -1221,8 +1219,6 @@ class PickersMixin:
         if not self._is_browsable(shortcut):
             return None
 
-        from ..constants import WINDOW_MAP
-
         window = WINDOW_MAP.get(shortcut.browse.lower(), "Videos")
         return (shortcut.path, window)
 
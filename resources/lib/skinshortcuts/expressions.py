@@ -12,12 +12,23 @@ $IF - Conditional expressions:
 from __future__ import annotations
 
 import re
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from .conditions import evaluate_condition
 from .log import get_logger, notify
 
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
 log = get_logger("Expressions")
 
+_MATH_PATTERN = re.compile(r"\$MATH\[([^\]]+)\]")
+_IF_PATTERN = re.compile(r"\$IF\[([^\]]+)\]")
+_THEN_PATTERN = re.compile(r"\bTHEN\b", re.IGNORECASE)
+_ELIF_PATTERN = re.compile(r"\bELIF\b", re.IGNORECASE)
+_ELSE_PATTERN = re.compile(r"\bELSE\b", re.IGNORECASE)
+
 
 class MathEvaluator:
     """Simple arithmetic expression evaluator.
@@ -26,7 +37,7 @@ class MathEvaluator:
     All property values are automatically converted to numbers.
     """
 
-    def __init__(self, variables: dict[str, str]):
+    def __init__(self, variables: Mapping[str, str]):
         self.variables = variables
         self.pos = 0
         self.expr = ""
@@ -186,7 +197,7 @@ class MathEvaluator:
             return 0.0
 
 
-def evaluate_math(expr: str, properties: dict[str, str]) -> str:
+def evaluate_math(expr: str, properties: Mapping[str, str]) -> str:
     """Evaluate a $MATH expression.
 
     Args:
@@ -200,20 +211,12 @@ def evaluate_math(expr: str, properties: dict[str, str]) -> str:
     return evaluator.evaluate(expr)
 
 
-def evaluate_if(expr: str, properties: dict[str, str]) -> str:
-    """Evaluate a $IF expression.
-
-    Syntax:
-        condition THEN trueValue
-        condition THEN trueValue ELSE falseValue
-        cond1 THEN val1 ELIF cond2 THEN val2 ELSE val3
-
-    Args:
-        expr: The expression inside $IF[...] (without the $IF[] wrapper)
-        properties: Property values for condition evaluation
+@lru_cache(maxsize=1024)
+def _parse_if(expr: str) -> tuple[tuple[tuple[str, str], ...], str | None]:
+    """Split a $IF expression into (condition, value) clauses and an else value.
 
-    Returns:
-        The selected value based on condition evaluation.
+    Parsing depends only on the expression text, so each distinct
+    expression is parsed once.
     """
     expr = expr.strip()
 
@@ -226,7 +229,7 @@ def evaluate_if(expr: str, properties: dict[str, str]) -> str:
         remaining = remaining.strip()
 
         # Find THEN keyword
-        then_match = re.search(r"\bTHEN\b", remaining, re.IGNORECASE)
+        then_match = _THEN_PATTERN.search(remaining)
         if not then_match:
             # No more THEN, treat remainder as else value if we have clauses
             if clauses and remaining:
@@ -237,8 +240,8 @@ def evaluate_if(expr: str, properties: dict[str, str]) -> str:
         after_then = remaining[then_match.end() :].strip()
 
         # Find the value: everything until ELIF, ELSE, or end
-        elif_match = re.search(r"\bELIF\b", after_then, re.IGNORECASE)
-        else_match = re.search(r"\bELSE\b", after_then, re.IGNORECASE)
+        elif_match = _ELIF_PATTERN.search(after_then)
+        else_match = _ELSE_PATTERN.search(after_then)
 
         # Determine where value ends
         end_pos = len(after_then)
@@ -262,6 +265,26 @@ def evaluate_if(expr: str, properties: dict[str, str]) -> str:
         else:
             break
 
+    return tuple(clauses), else_value
+
+
+def evaluate_if(expr: str, properties: Mapping[str, str]) -> str:
+    """Evaluate a $IF expression.
+
+    Syntax:
+        condition THEN trueValue
+        condition THEN trueValue ELSE falseValue
+        cond1 THEN val1 ELIF cond2 THEN val2 ELSE val3
+
+    Args:
+        expr: The expression inside $IF[...] (without the $IF[] wrapper)
+        properties: Property values for condition evaluation
+
+    Returns:
+        The selected value based on condition evaluation.
+    """
+    clauses, else_value = _parse_if(expr)
+
     # Evaluate clauses in order
     for condition, value in clauses:
         if evaluate_condition(condition, properties):
@@ -273,7 +296,7 @@ def evaluate_if(expr: str, properties: dict[str, str]) -> str:
 
 def process_math_expressions(
     text: str,
-    properties: dict[str, str],
+    properties: Mapping[str, str],
 ) -> str:
     """Process all $MATH[...] expressions in text.
 
@@ -284,17 +307,18 @@ def process_math_expressions(
     Returns:
         Text with all $MATH expressions evaluated.
     """
-    pattern = re.compile(r"\$MATH\[([^\]]+)\]")
+    if "$MATH[" not in text:
+        return text
 
     def replace(match: re.Match) -> str:
         return evaluate_math(match.group(1), properties)
 
-    return pattern.sub(replace, text)
+    return _MATH_PATTERN.sub(replace, text)
 
 
 def process_if_expressions(
     text: str,
-    properties: dict[str, str],
+    properties: Mapping[str, str],
 ) -> str:
     """Process all $IF[...] expressions in text.
 
@@ -305,9 +329,10 @@ def process_if_expressions(
     Returns:
         Text with all $IF expressions evaluated.
     """
-    pattern = re.compile(r"\$IF\[([^\]]+)\]")
+    if "$IF[" not in text:
+        return text
 
     def replace(match: re.Match) -> str:
         return evaluate_if(match.group(1), properties)
 
-    return pattern.sub(replace, text)
+    return _IF_PATTERN.sub(replace, text)
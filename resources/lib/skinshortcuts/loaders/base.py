@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import re
 import xml.etree.ElementTree as ET
+from functools import lru_cache
 from pathlib import Path
 
 from ..exceptions import ConfigError
@@ -20,23 +21,23 @@ NO_SUFFIX_PROPERTIES = frozenset({
 _PROPERTY_PATTERN = re.compile(r"([a-zA-Z_][a-zA-Z0-9_\.]*)([=~])")
 
 
+@lru_cache(maxsize=1024)
 def apply_suffix_transform(text: str, suffix: str) -> str:
     """Apply suffix transform to property names in conditions/from attributes.
 
     Transforms property names (before = or ~) but not values.
-    Skips properties in NO_SUFFIX_PROPERTIES.
+    Skips properties in NO_SUFFIX_PROPERTIES. Results are cached, since the
+    same schema conditions are suffixed for every item and widget slot.
     """
     if not suffix or not text:
         return text
 
-    def replace_property(match: re.Match) -> str:
-        prop_name = match.group(1)
-        operator = match.group(2)
-        if prop_name in NO_SUFFIX_PROPERTIES:
-            return f"{prop_name}{operator}"
-        return f"{prop_name}{suffix}{operator}"
-
-    return _PROPERTY_PATTERN.sub(replace_property, text)
+    # split() yields [text, name, operator, text, name, operator, ..., text]
+    parts = _PROPERTY_PATTERN.split(text)
+    for i in range(1, len(parts), 3):
+        if parts[i] not in NO_SUFFIX_PROPERTIES:
+            parts[i] += suffix
+    return "".join(parts)
 
 
 def apply_suffix_to_from(from_value: str, suffix: str) -> str:
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import sys
 from pathlib import Path
 
 from ..exceptions import MenuConfigError
@@ -415,7 +416,8 @@ def _parse_item(
     for prop_elem in elem.findall("property"):
         prop_name = get_attr(prop_elem, "name")
         if prop_name and prop_elem.text:
-            properties[prop_name] = prop_elem.text.strip()
+            # Interned: property names are dict keys in every template context
+            properties[sys.intern(prop_name)] = prop_elem.text.strip()
 
     if is_widget_submenu and "widgetLabel" not in properties:
         properties["widgetLabel"] = label
@@ -467,7 +469,7 @@ def _parse_defaults(elem) -> MenuDefaults:
     for prop_elem in elem.findall("property"):
         name = get_attr(prop_elem, "name")
         if name and prop_elem.text:
-            properties[name] = prop_elem.text.strip()
+            properties[sys.intern(name)] = prop_elem.text.strip()
 
     widget_attr = get_attr(elem, "widget")
     if widget_attr:
@@ -6,6 +6,7 @@ Parses templates.xml with support for expressions, includes, presets, and templa
 from __future__ import annotations
 
 import copy
+import sys
 import xml.etree.ElementTree as ET
 from pathlib import Path
 
@@ -269,7 +270,7 @@ class TemplateLoader:
         if section is None:
             return
         for elem in section.findall("include"):
-            name = (elem.get("name") or "").strip()
+            name = sys.intern((elem.get("name") or "").strip())
             if not name:
                 log.warning(f"{self.path}: <{elem.tag}> definition missing 'name' attribute, skipping")
                 continue
@@ -290,7 +291,8 @@ class TemplateLoader:
 
     def _parse_property(self, elem: ET.Element, suffix: str = "") -> TemplateProperty | None:
         """Parse a property element."""
-        name = (elem.get("name") or "").strip()
+        # Interned: property names and sources are context keys for every item
+        name = sys.intern((elem.get("name") or "").strip())
         if not name:
             log.warning(f"{self.path}: <{elem.tag}> missing 'name' attribute, skipping")
             return None
@@ -308,13 +310,13 @@ class TemplateLoader:
         return TemplateProperty(
             name=name,
             value=value,
-            from_source=from_source,
+            from_source=sys.intern(from_source),
             condition=condition,
         )
 
     def _parse_var(self, elem: ET.Element, suffix: str = "") -> TemplateVar | None:
         """Parse a var element for internal template resolution."""
-        name = (elem.get("name") or "").strip()
+        name = sys.intern((elem.get("name") or "").strip())
         if not name:
             log.warning(f"{self.path}: <{elem.tag}> missing 'name' attribute, skipping")
             return None
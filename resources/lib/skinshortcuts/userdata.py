@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import json
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
@@ -171,6 +172,10 @@ class UserData:
                         else:
                             # Legacy: plain string action
                             actions.append(Action(action=act))
+                properties = item_data.get("properties")
+                if properties:
+                    # Match the interned names from the skin's menu and template files
+                    item_data["properties"] = {sys.intern(k): v for k, v in properties.items()}
                 items.append(MenuItemOverride(**item_data, actions=actions))
             removed = menu_data.get("removed", [])
             menus[menu_id] = MenuOverride(items=items, removed=removed)
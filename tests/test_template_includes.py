@@ -0,0 +1,44 @@
+"""Regression tests for <skinshortcuts include="..."/> expansion."""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(TESTS_DIR.parent / "resources" / "lib"))
+
+from skinshortcuts.builders.template import TemplateBuilder
+from skinshortcuts.config import SkinConfig
+
+FIXTURES = TESTS_DIR / "fixtures"
+
+
+class SiblingIncludeOrderTest(unittest.TestCase):
+    """Sibling includes feeding one variable keep the established value order."""
+
+    def test_merged_variable_values_follow_last_to_first_expansion(self):
+        fixture = FIXTURES / "include_order"
+        config = SkinConfig.load(fixture, load_user=False)
+        for menu in config.menus:
+            config.resolve_item_properties(menu)
+
+        root = TemplateBuilder(config.templates, config.menus, config.property_schema).build()
+
+        variable = root.find("variable[@name='Shared-home']")
+        self.assertIsNotNone(variable)
+        self.assertEqual(
+            [value.text for value in variable.findall("value")],
+            ["B-first", "B-second", "A-first", "A-second"],
+        )
+
+        group = root.find("include[@name='skinshortcuts-template-Order']/control")
+        self.assertEqual(
+            [child.text for child in group],
+            ["A-first", "A-second", "B-first", "B-second"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()